@@ -1,58 +1,934 @@
+#Importing this module does no work beyond defining its functions, so the query functions can be reused from services,
+#tests and notebooks. Only modules that sqlite3 loads anyway are imported here; the others (argparse, json, csv, difflib ...)
+#are imported inside the functions that need them, which keeps a library import close to the cost of importing sqlite3.
+#Call connect() and init_schema() to get a ready connection, or run the file for the command line and menu (main()).
+import datetime
+import functools
+import itertools
+import os
 import sqlite3
+import sys
+import threading
+import weakref
+from time import perf_counter
 
-# Connecting to database (and/or create it if it doesn't yet exist)
-conn = sqlite3.connect('flight_management.db')
+def parse_flight_count(value):
+    #Accepts plain numbers as well as 10k / 1m / 10M style sizes for the generate and benchmark commands
+    import argparse
+    multipliers = {"k": 1000, "m": 1000000}
+    value = value.strip().lower().replace("_", "")
+    try:
+        if value and value[-1] in multipliers:
+            count = int(float(value[:-1]) * multipliers[value[-1]])
+        else:
+            count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a flight count (e.g. 10000, 10k, 1m)")
+    if count < 1:
+        raise argparse.ArgumentTypeError("the flight count must be at least 1")
+    return count
 
-#Protects against deletion of data used as foreign keys e.g. destination_id rows that impact the flights table
-conn.execute("PRAGMA foreign_keys = ON;")
+def parse_positive_count(value):
+    import argparse
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a whole number")
+    if count < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return count
 
-print("Database ready >>>")
+flight_statuses = ["Arrived", "Cancelled", "Departed", "Boarding", "Scheduled"]
 
-# Dropping any old tables prior to creating new ones
-conn.execute("DROP TABLE IF EXISTS flights")
-conn.execute("DROP TABLE IF EXISTS destinations")
-conn.execute("DROP TABLE IF EXISTS pilots")
+def update_flights(conn, flight_ids, update_one, update_many, value, *options):
+    #One flight id uses the single-flight update, several use the batch version (one executemany)
+    if len(flight_ids) == 1:
+        update_one(conn, flight_ids[0], value, *options)
+    else:
+        update_many(conn, flight_ids, value, *options)
 
-# Creates the Destinations table
-conn.execute("""
-CREATE TABLE destinations (
-    destination_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    airport TEXT NOT NULL,
-    city TEXT NOT NULL,
-    country TEXT NOT NULL
-)
-""")
-
-# Creates the Pilots table
-conn.execute("""
-CREATE TABLE pilots (
-    pilot_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    forename TEXT NOT NULL,
-    surname TEXT NOT NULL,
-    license_no TEXT NOT NULL,
-    years_of_xp INTEGER NOT NULL,
-    email TEXT,
-    phone TEXT
-)
-""")
-
-# Creates  Flights table 
-conn.execute("""
-CREATE TABLE flights (
-    flight_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date TEXT NOT NULL,
-    time TEXT NOT NULL,
-    origin_id INTEGER NOT NULL,
-    destination_id INTEGER NOT NULL,
-    pilot_id INTEGER NOT NULL,
-    status TEXT NOT NULL,
-    FOREIGN KEY (origin_id) REFERENCES destinations(destination_id),
-    FOREIGN KEY (destination_id) REFERENCES destinations(destination_id),
-    FOREIGN KEY (pilot_id) REFERENCES pilots(pilot_id)
-)
-""")
+def flight_list_filters(args):
+    return {
+        "origin_airport": args.origin_airport,
+        "origin_city": args.origin_city,
+        "destination_airport": args.destination_airport,
+        "destination_city": args.destination_city,
+        "statuses": args.statuses,
+        "date": args.date,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "departure_from": args.departure_from,
+        "departure_to": args.departure_to,
+        "pilot_id": args.pilot_id,
+        "time_from": args.time_from,
+        "time_to": args.time_to,
+        "prefix_match": args.prefix
+    }
+
+def add_operation_parsers(subparsers):
+    #The flights/destinations/pilots/report commands, shared by the command line and batch files.
+    #Each command stores the function that runs it as args.run(conn, args).
+    flights_parser = subparsers.add_parser("flights", help="list, search, add, update or delete flights")
+    flights_commands = flights_parser.add_subparsers(dest="action", required=True)
+
+    flights_list = flights_commands.add_parser("list", help="list flights matching every filter given (all flights if none)")
+    flights_list.add_argument("--origin-airport")
+    flights_list.add_argument("--origin-city")
+    flights_list.add_argument("--destination-airport")
+    flights_list.add_argument("--destination-city")
+    flights_list.add_argument("--status", dest="statuses", action="append", choices=flight_statuses, help="can be given more than once")
+    flights_list.add_argument("--date", help="YYYY-MM-DD")
+    flights_list.add_argument("--date-from", help="YYYY-MM-DD, inclusive")
+    flights_list.add_argument("--date-to", help="YYYY-MM-DD, inclusive")
+    flights_list.add_argument("--departure-from", help="'YYYY-MM-DD HH:MM', inclusive")
+    flights_list.add_argument("--departure-to", help="'YYYY-MM-DD HH:MM', inclusive")
+    flights_list.add_argument("--pilot-id", type=int)
+    flights_list.add_argument("--time-from", help="HH:MM, inclusive")
+    flights_list.add_argument("--time-to", help="HH:MM, inclusive (earlier than --time-from for an overnight window)")
+    flights_list.add_argument("--prefix", action="store_true", help="match airports and cities by the start of their name")
+    flights_list.add_argument("--after-id", type=int, default=0, help="only list flights with a higher flight_id")
+    flights_list.set_defaults(run=lambda conn, args: search_flights(conn, args.after_id, **flight_list_filters(args)))
+
+    flights_departing = flights_commands.add_parser("departing", help="list flights in departure order")
+    flights_departing.add_argument("--from", dest="start", help="'YYYY-MM-DD HH:MM' or YYYY-MM-DD, inclusive")
+    flights_departing.add_argument("--to", dest="end", help="'YYYY-MM-DD HH:MM' or YYYY-MM-DD, exclusive")
+    flights_departing.add_argument("--descending", action="store_true", help="latest departures first")
+    flights_departing.set_defaults(run=lambda conn, args: flights_departing_between(conn, args.start, args.end, descending=args.descending))
+
+    flights_search = flights_commands.add_parser("search", help="flights whose pilot or destination matches the keywords")
+    flights_search.add_argument("text")
+    flights_search.set_defaults(run=lambda conn, args: flights_by_keywords(conn, args.text))
+
+    flights_connection = flights_commands.add_parser("connection", help="earliest arriving itinerary between two airports, with changes")
+    flights_connection.add_argument("origin", help="airport, city or destination id")
+    flights_connection.add_argument("destination", help="airport, city or destination id")
+    flights_connection.add_argument("date", help="YYYY-MM-DD")
+    flights_connection.add_argument("--after", default="00:00", help="earliest departure time on that date, HH:MM (default 00:00)")
+    flights_connection.add_argument("--min-connection", type=int, help="minimum minutes between landing and the next departure (default 45)")
+    flights_connection.add_argument("--flight-minutes", type=int, help="assumed length of every flight in minutes (default 120)")
+    flights_connection.add_argument("--search-days", type=int, help="days after the date the itinerary may still depart on (default 1)")
+    flights_connection.set_defaults(run=lambda conn, args: find_connection(
+        conn, args.origin, args.destination, args.date, args.after, args.min_connection, args.flight_minutes, args.search_days))
+
+    flights_add = flights_commands.add_parser("add", help="add a new flight")
+    flights_add.add_argument("date", help="YYYY-MM-DD")
+    flights_add.add_argument("time", help="HH:MM")
+    flights_add.add_argument("origin_id", type=int)
+    flights_add.add_argument("destination_id", type=int)
+    flights_add.add_argument("pilot_id", type=int)
+    flights_add.add_argument("status", nargs="?", default="Scheduled", choices=flight_statuses)
+    flights_add.add_argument("--allow-conflicts", action="store_true", help="don't refuse a change that double-books a pilot")
+    flights_add.set_defaults(run=lambda conn, args: insert_new_flight_record(
+        conn, args.date, args.time, args.origin_id, args.destination_id, args.pilot_id, args.status, args.allow_conflicts))
+
+    flights_update_date = flights_commands.add_parser("update-date", help="change the date of one or more flights")
+    flights_update_date.add_argument("flight_ids", type=int, nargs="+")
+    flights_update_date.add_argument("date", help="YYYY-MM-DD")
+    flights_update_date.add_argument("--allow-conflicts", action="store_true", help="don't refuse a change that double-books a pilot")
+    flights_update_date.set_defaults(run=lambda conn, args: update_flights(
+        conn, args.flight_ids, update_flight_date, update_flight_date_batch, args.date, args.allow_conflicts))
+
+    flights_update_time = flights_commands.add_parser("update-time", help="change the departure time of one or more flights")
+    flights_update_time.add_argument("flight_ids", type=int, nargs="+")
+    flights_update_time.add_argument("time", help="HH:MM")
+    flights_update_time.add_argument("--allow-conflicts", action="store_true", help="don't refuse a change that double-books a pilot")
+    flights_update_time.set_defaults(run=lambda conn, args: update_flights(
+        conn, args.flight_ids, update_flight_time, update_flight_time_batch, args.time, args.allow_conflicts))
+
+    flights_update_status = flights_commands.add_parser("update-status", help="change the status of one or more flights")
+    flights_update_status.add_argument("flight_ids", type=int, nargs="+")
+    flights_update_status.add_argument("status", choices=flight_statuses)
+    flights_update_status.add_argument("--allow-conflicts", action="store_true", help="don't refuse a change that double-books a pilot")
+    flights_update_status.set_defaults(run=lambda conn, args: update_flights(
+        conn, args.flight_ids, update_flight_status, update_flight_status_batch, args.status, args.allow_conflicts))
+
+    flights_update_destination = flights_commands.add_parser("update-destination", help="change the destination of one or more flights")
+    flights_update_destination.add_argument("flight_ids", type=int, nargs="+")
+    flights_update_destination.add_argument("destination_id", type=int)
+    flights_update_destination.set_defaults(run=lambda conn, args: update_flights(
+        conn, args.flight_ids, update_flight_destination, update_flight_destination_batch, args.destination_id))
+
+    flights_assign_pilot = flights_commands.add_parser("assign-pilot", help="assign a pilot to one or more flights")
+    flights_assign_pilot.add_argument("flight_ids", type=int, nargs="+")
+    flights_assign_pilot.add_argument("pilot_id", type=int)
+    flights_assign_pilot.add_argument("--allow-conflicts", action="store_true", help="don't refuse a change that double-books a pilot")
+    flights_assign_pilot.set_defaults(run=lambda conn, args: update_flights(
+        conn, args.flight_ids, assign_pilot_to_flight, assign_pilot_to_flight_batch, args.pilot_id, args.allow_conflicts))
+
+    flights_auto_assign = flights_commands.add_parser("auto-assign", help="re-plan the pilots of every Scheduled flight in a date range")
+    flights_auto_assign.add_argument("date_from", help="YYYY-MM-DD, inclusive")
+    flights_auto_assign.add_argument("date_to", help="YYYY-MM-DD, inclusive")
+    flights_auto_assign.add_argument("--dry-run", action="store_true", help="print the proposed changes without saving them")
+    flights_auto_assign.add_argument("--turnaround", type=int, help="minimum minutes between a pilot's departures (default 60)")
+    flights_auto_assign.add_argument("--rest", type=int, default=0, help="extra rest minutes a pilot needs on top of the turnaround (default 0)")
+    flights_auto_assign.add_argument("--max-per-day", type=int, help="most flights a pilot may fly in one day")
+    flights_auto_assign.set_defaults(run=lambda conn, args: auto_assign_pilots(
+        conn, args.date_from, args.date_to, args.dry_run, args.turnaround, args.rest, args.max_per_day))
+
+    flights_delete = flights_commands.add_parser("delete", help="delete a flight")
+    flights_delete.add_argument("flight_id", type=int)
+    flights_delete.set_defaults(run=lambda conn, args: delete_flight_record(conn, args.flight_id))
+
+    destinations_parser = subparsers.add_parser("destinations", help="list, search, add or delete destinations")
+    destinations_commands = destinations_parser.add_subparsers(dest="action", required=True)
+    destinations_commands.add_parser("list", help="list all destinations").set_defaults(
+        run=lambda conn, args: view_all_destinations(conn))
+    destinations_search = destinations_commands.add_parser("search", help="keyword search over airports, cities, countries and pilots")
+    destinations_search.add_argument("text")
+    destinations_search.set_defaults(run=lambda conn, args: search_directory(conn, args.text))
+    destinations_add = destinations_commands.add_parser("add", help="add a destination")
+    destinations_add.add_argument("airport")
+    destinations_add.add_argument("city")
+    destinations_add.add_argument("country")
+    destinations_add.set_defaults(run=lambda conn, args: add_destination(conn, args.airport, args.city, args.country))
+    destinations_delete = destinations_commands.add_parser("delete", help="delete a destination by airport name")
+    destinations_delete.add_argument("airport")
+    destinations_delete.set_defaults(run=lambda conn, args: delete_destination(conn, args.airport))
+
+    pilots_parser = subparsers.add_parser("pilots", help="view pilots and their schedules")
+    pilots_commands = pilots_parser.add_subparsers(dest="action", required=True)
+    pilots_commands.add_parser("list", help="list all pilots").set_defaults(run=lambda conn, args: view_all_pilots(conn))
+    pilots_schedule = pilots_commands.add_parser("schedule", help="flights assigned to a pilot")
+    pilots_schedule.add_argument("pilot_id", type=int)
+    pilots_schedule.set_defaults(run=lambda conn, args: filter_by_pilot(conn, args.pilot_id))
+    pilots_commands.add_parser("most-experienced", help="the most experienced pilots").set_defaults(
+        run=lambda conn, args: most_experienced_pilots(conn))
+    pilots_commands.add_parser("least-experienced", help="the least experienced pilots").set_defaults(
+        run=lambda conn, args: least_experienced_pilots(conn))
+    pilots_conflicts = pilots_commands.add_parser("conflicts", help="every pair of flights that double-books a pilot")
+    pilots_conflicts.add_argument("--turnaround", type=int, help="minimum minutes between a pilot's departures (default 60)")
+    pilots_conflicts.set_defaults(run=lambda conn, args: find_pilot_conflicts(conn, args.turnaround))
+
+    report_parser = subparsers.add_parser("report", help="flight count reports")
+    report_commands = report_parser.add_subparsers(dest="action", required=True)
+    report_commands.add_parser("popular-destinations", help="destinations with the most flights").set_defaults(
+        run=lambda conn, args: most_popular_destinations(conn))
+    report_commands.add_parser("unpopular-destinations", help="destinations with the fewest flights").set_defaults(
+        run=lambda conn, args: least_popular_destinations(conn))
+    report_commands.add_parser("pilot-workload", help="number of flights assigned to each pilot").set_defaults(
+        run=lambda conn, args: count_flights_by_pilot(conn))
+    report_commands.add_parser("flights-by-status", help="number of flights with each status").set_defaults(
+        run=lambda conn, args: count_flights_by_status(conn))
+
+def build_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description="Flight Information Tool")
+    parser.add_argument("--seed", action="store_true", help="load the sample destinations, pilots and flights into an empty database")
+    parser.add_argument("--profile", help="connection tuning profile to use (default, reporting, ingest or one defined in the config file)")
+    parser.add_argument("--slow-query-ms", type=float, help="enable query instrumentation and log statements slower than this many milliseconds")
+    parser.add_argument("--query-log", help="file slow statements are appended to (default slow_queries.log)")
+    parser.add_argument("--query-stats", action="store_true", help="enable query instrumentation and print per-function statistics on exit")
+    subparsers = parser.add_subparsers(dest="command")
+    import_parser = subparsers.add_parser("import", help="bulk load flights from a CSV or JSON Lines file")
+    import_parser.add_argument("path", help="file with date, time, origin_id, destination_id, pilot_id and status for each flight (.csv, .jsonl)")
+    import_parser.add_argument("--batch-size", type=int, default=10000, help="rows inserted per executemany/transaction (default 10000)")
+    import_parser.add_argument("--allow-conflicts", action="store_true", help="don't stop at a batch that double-books a pilot")
+    export_parser = subparsers.add_parser("export", help="stream flights or a raw table to CSV, JSON Lines, Parquet or Arrow")
+    export_parser.add_argument("path", help="output file; the format and compression follow the name (e.g. flights.csv.gz, flights.parquet) unless given")
+    export_parser.add_argument("--source", default="flight_details", choices=["flight_details", "flights", "destinations", "pilots"],
+                               help="joined flight view (default) or a raw table")
+    export_parser.add_argument("--format", dest="export_format", choices=["csv", "jsonl", "parquet", "arrow"], help="output format (parquet and arrow need pyarrow)")
+    export_parser.add_argument("--compression", choices=["none", "gzip", "zstd"], help="gzip or zstd (zstd needs the zstandard package for csv/jsonl)")
+    export_parser.add_argument("--chunk-size", type=int, default=50000, help="rows read and written at a time (default 50000)")
+    analytics_parser = subparsers.add_parser("analytics", help="ad-hoc counts, ratios and histograms over flights, computed with NumPy")
+    analytics_commands = analytics_parser.add_subparsers(dest="action", required=True)
+    analytics_count_parser = analytics_commands.add_parser("count", help="flights per group, largest groups first")
+    analytics_count_parser.add_argument("--by", dest="keys", nargs="+", required=True, choices=analytics_keys, help="keys to group by, e.g. --by route day")
+    analytics_ratio_parser = analytics_commands.add_parser("ratio", help="share of each group's flights with a status, e.g. cancellations per origin")
+    analytics_ratio_parser.add_argument("status", help="status to count, e.g. Cancelled")
+    analytics_ratio_parser.add_argument("--by", dest="keys", nargs="+", required=True, choices=analytics_keys, help="keys to group by")
+    analytics_histogram_parser = analytics_commands.add_parser("histogram", help="flights per hour, weekday, day or month including empty bins")
+    analytics_histogram_parser.add_argument("key", choices=sorted(analytics_time_keys))
+    for analytics_action_parser in (analytics_count_parser, analytics_ratio_parser, analytics_histogram_parser):
+        if analytics_action_parser is not analytics_ratio_parser:
+            analytics_action_parser.add_argument("--status", dest="statuses", action="append", help="only count flights with this status (can be given more than once)")
+        analytics_action_parser.add_argument("--date-from", help="YYYY-MM-DD, inclusive")
+        analytics_action_parser.add_argument("--date-to", help="YYYY-MM-DD, inclusive")
+        if analytics_action_parser is not analytics_histogram_parser:
+            analytics_action_parser.add_argument("--top", type=int, help="only show this many groups")
+    advance_parser = subparsers.add_parser("advance-statuses", help="move flights to Boarding, Departed and Arrived as their departure passes")
+    advance_parser.add_argument("--every", type=float, help="keep running, with a tick every this many seconds (default: one tick and exit)")
+    advance_parser.add_argument("--now", help="'YYYY-MM-DD HH:MM' to run a single tick as of, instead of the current time")
+    advance_parser.add_argument("--boarding-minutes", type=int, help="minutes before departure that boarding starts (default 40)")
+    advance_parser.add_argument("--departed-minutes", type=int, help="minutes after the departure time that a flight counts as departed (default 0)")
+    advance_parser.add_argument("--arrived-minutes", type=int, help="minutes after the departure time that a flight counts as arrived (default 120)")
+    advance_parser.add_argument("--dry-run", action="store_true", help="report what would change without saving it")
+    changes_parser = subparsers.add_parser("changes", help="read the change log of flights, pilots and destinations and manage its consumers")
+    changes_commands = changes_parser.add_subparsers(dest="action", required=True)
+    changes_list = changes_commands.add_parser("list", help="changes after a sequence number")
+    changes_list.add_argument("--after", type=int, help="only changes with a higher seq (default: from the oldest change still kept)")
+    changes_list.add_argument("--limit", type=int, default=100, help="most changes to show (default 100)")
+    changes_list.add_argument("--table", dest="tables", action="append", choices=change_log_tables, help="only this table (can be given more than once)")
+    changes_list.set_defaults(run=lambda conn, args: list_changes(conn, args.after, args.limit, args.tables))
+    changes_register = changes_commands.add_parser("register", help="add a consumer, starting at the end of the log")
+    changes_register.add_argument("name")
+    changes_register.add_argument("--from-start", action="store_true", help="start at the oldest change still in the log instead")
+    changes_register.set_defaults(run=lambda conn, args: register_change_consumer(conn, args.name, args.from_start))
+    changes_consume = changes_commands.add_parser("consume", help="print a consumer's unread changes and move its checkpoint past them")
+    changes_consume.add_argument("name")
+    changes_consume.add_argument("--batch-size", type=int, default=1000, help="changes read and checkpointed at a time (default 1000)")
+    changes_consume.set_defaults(run=lambda conn, args: consume_changes(conn, args.name, args.batch_size))
+    changes_commands.add_parser("consumers", help="every consumer with its checkpoint and how far behind it is").set_defaults(
+        run=lambda conn, args: view_change_consumers(conn))
+    changes_remove = changes_commands.add_parser("remove", help="remove a consumer so it no longer holds back compaction")
+    changes_remove.add_argument("name")
+    changes_remove.set_defaults(run=lambda conn, args: remove_change_consumer(conn, args.name))
+    changes_commands.add_parser("compact", help="delete the changes every consumer has read").set_defaults(
+        run=lambda conn, args: compact_change_log(conn))
+    counts_parser = subparsers.add_parser("counts", help="check or rebuild the per pilot/destination/status flight counters")
+    counts_parser.add_argument("action", choices=["verify", "rebuild"])
+    generate_parser = subparsers.add_parser("generate", help="fill an empty database with seeded synthetic destinations, pilots and flights")
+    generate_parser.add_argument("flights", type=parse_flight_count, help="number of flights to generate, e.g. 10k, 1m or 10m")
+    generate_parser.add_argument("--random-seed", type=int, default=42, help="seed for the generator; the same seed always gives the same data (default 42)")
+    generate_parser.add_argument("--destinations", type=int, help="number of destinations (default scales with the flight count)")
+    generate_parser.add_argument("--pilots", type=int, help="number of pilots (default scales with the flight count)")
+    generate_parser.add_argument("--batch-size", type=int, default=10000, help="rows inserted per executemany/transaction (default 10000)")
+    benchmark_parser = subparsers.add_parser("benchmark", help="time every query and write function against generated databases")
+    benchmark_parser.add_argument("--sizes", type=parse_flight_count, nargs="+", default=[10000], help="flight counts to benchmark, e.g. 10k 1m 10m (default 10k)")
+    benchmark_parser.add_argument("--random-seed", type=int, default=42, help="seed for the generated data and the query arguments (default 42)")
+    benchmark_parser.add_argument("--repeat", type=int, default=20, help="calls per function (default 20)")
+    benchmark_parser.add_argument("--time-limit", type=float, default=10.0, help="stop calling a function after this many seconds, once it has run at least once (default 10)")
+    benchmark_parser.add_argument("--functions", nargs="+", help="only benchmark these functions")
+    benchmark_parser.add_argument("--data-dir", default="benchmark_data", help="where generated databases are kept between runs (default benchmark_data)")
+    benchmark_parser.add_argument("--output", default="benchmark_results.json", help="JSON file the results are written to (default benchmark_results.json)")
+    batch_parser = subparsers.add_parser("batch", help="run a file of flights/destinations/pilots/report commands against one connection")
+    batch_parser.add_argument("path", help="file with one command per line, e.g. 'flights update-status 12 Cancelled' (# starts a comment)")
+    batch_parser.add_argument("--batch-size", type=int, default=1000, help="commands run per transaction (default 1000)")
+    serve_parser = subparsers.add_parser("serve", help="serve the flight, pilot, destination and report queries as a JSON HTTP API")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8080, help="port to listen on (default 8080)")
+    serve_parser.add_argument("--connections", type=int, default=8, help="read-only connections, i.e. queries run at once (default 8)")
+    serve_parser.add_argument("--queue-timeout", type=float, default=5.0, help="seconds a request waits for a connection before a 503 (default 5)")
+    load_test_parser = subparsers.add_parser("load-test", help="measure latency and throughput of a running API server")
+    load_test_parser.add_argument("--url", default="http://127.0.0.1:8080", help="server to test (default http://127.0.0.1:8080)")
+    load_test_parser.add_argument("--paths", nargs="+", default=["/flights?status=Scheduled", "/pilots/1/schedule", "/destinations", "/reports/popular-destinations"],
+                                  help="request paths, used round-robin")
+    load_test_parser.add_argument("--requests", type=parse_positive_count, default=1000, help="total requests (default 1000)")
+    load_test_parser.add_argument("--concurrency", type=parse_positive_count, default=8, help="keep-alive client connections sending at once (default 8)")
+    load_test_parser.add_argument("--etag", action="store_true", help="revalidate with If-None-Match to measure 304 responses")
+    load_test_parser.add_argument("--output", help="also write the results to this JSON file")
+    add_operation_parsers(subparsers)
+    return parser
+
+def build_command_parser():
+    #Parser for the lines of a batch file
+    import argparse
+    command_parser = argparse.ArgumentParser(prog="batch command", add_help=False)
+    add_operation_parsers(command_parser.add_subparsers(dest="command", required=True))
+    return command_parser
+
+#Connection tuning profiles. Reporting nodes favour a large page cache and memory-mapped reads, ingest nodes favour
+#a large cache and a long busy timeout for big write transactions. WAL lets readers carry on while a writer commits.
+#Extra profiles (or overrides of these ones) can be added to the config file as [profile:<name>] sections.
+connection_profiles = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous":  "NORMAL",
+        "mmap_size":    268435456,
+        "cache_size":   -65536,
+        "temp_store":   "MEMORY",
+        "busy_timeout": 5000
+    },
+    "reporting": {
+        "journal_mode": "WAL",
+        "synchronous":  "NORMAL",
+        "mmap_size":    2147483648,
+        "cache_size":   -524288,
+        "temp_store":   "MEMORY",
+        "busy_timeout": 10000
+    },
+    "ingest": {
+        "journal_mode": "WAL",
+        "synchronous":  "NORMAL",
+        "mmap_size":    268435456,
+        "cache_size":   -1048576,
+        "temp_store":   "MEMORY",
+        "busy_timeout": 30000
+    }
+}
+
+#The config file and the database/profile choice can all be overridden from the environment
+default_config_path = "flight_management.ini"
+default_database_path = "flight_management.db"
+
+def load_config(path=None):
+    #Reads the optional INI config file: a [database] section with path/profile and any [profile:<name>] sections
+    import configparser
+    config = configparser.ConfigParser()
+    config.read(path or os.environ.get("FLIGHT_DB_CONFIG", default_config_path))
+    return config
+
+def connection_profile(name, config):
+    #Looks up a profile by name, layering any [profile:<name>] settings from the config file over the built-in values.
+    #Profiles that only exist in the config file start from the default profile.
+    section = f"profile:{name}"
+    if name not in connection_profiles and not config.has_section(section):
+        raise ValueError(f"Unknown connection profile '{name}'")
+    settings = dict(connection_profiles.get(name, connection_profiles["default"]))
+    if config.has_section(section):
+        settings.update(config.items(section))
+    for pragma, value in settings.items():
+        if pragma not in connection_profiles["default"] or not str(value).lstrip("-").isalnum():
+            raise ValueError(f"Invalid setting in connection profile '{name}': {pragma} = {value}")
+    return settings
+
+#Query instrumentation. It is off unless a slow query threshold (--slow-query-ms, FLIGHT_SLOW_QUERY_MS or slow_query_ms
+#in the [instrumentation] section of the config file) or --query-stats is given, because timing every fetch adds some
+#Python overhead per row.
+#Functions marked with @instrumented record their call count, a latency histogram and the rows their statements returned
+#or changed. Inside a call each statement is timed across its execute and all of its fetches by InstrumentedCursor, and
+#the trace callback supplies the SQL text with the bound values filled in. Statements over the threshold are appended
+#to the slow query log together with their EXPLAIN QUERY PLAN output.
+#The API server and AsyncFlightDatabase run instrumented calls on several threads at once, so each thread keeps its own
+#stack of active calls and pending statement, and the shared stats and slow query log are updated under a lock.
+latency_buckets_ms = (1, 5, 10, 50, 100, 500, 1000, 5000)
+default_slow_query_log = "slow_queries.log"
+instrumentation = {"enabled": False, "slow_query_ms": None, "log_path": default_slow_query_log}
+query_stats = {}
+query_stats_lock = threading.Lock()
+call_state = threading.local()
+
+def active_calls():
+    #This thread's stack of instrumented calls; its pending statement (waiting for the trace callback) is call_state.pending
+    if not hasattr(call_state, "calls"):
+        call_state.calls = []
+        call_state.pending = None
+    return call_state.calls
+
+def configure_instrumentation(slow_query_ms=None, log_path=None, stats=False, config=None):
+    if config is None:
+        config = load_config()
+    if slow_query_ms is None:
+        slow_query_ms = os.environ.get("FLIGHT_SLOW_QUERY_MS") or config.get("instrumentation", "slow_query_ms", fallback=None)
+    try:
+        instrumentation["slow_query_ms"] = float(slow_query_ms) if slow_query_ms is not None else None
+    except ValueError:
+        raise ValueError(f"Invalid slow query threshold '{slow_query_ms}': expected a number of milliseconds")
+    instrumentation["log_path"] = log_path or config.get("instrumentation", "log", fallback=default_slow_query_log)
+    instrumentation["enabled"] = stats or instrumentation["slow_query_ms"] is not None
+
+class InstrumentedCursor(sqlite3.Cursor):
+    #Adds the time spent in execute and in every fetch to the statement record of the innermost instrumented call
+    record = None
+
+    def start(self, sql):
+        self.record = None
+        calls = active_calls()
+        if calls:
+            self.record = {"sql": sql, "keyword": sql.split(None, 1)[:1], "seconds": 0.0, "rows": 0, "conn": self.connection}
+            calls[-1]["statements"].append(self.record)
+            call_state.pending = self.record
+
+    def timed(self, method, *method_args):
+        start = perf_counter()
+        try:
+            return method(*method_args)
+        finally:
+            if self.record is not None:
+                self.record["seconds"] += perf_counter() - start
+
+    def finish_write(self):
+        if self.record is not None and self.description is None and self.rowcount > 0:
+            self.record["rows"] += self.rowcount
+
+    def execute(self, sql, parameters=()):
+        self.start(sql)
+        self.timed(super().execute, sql, parameters)
+        self.finish_write()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self.start(sql)
+        self.timed(super().executemany, sql, seq_of_parameters)
+        self.finish_write()
+        return self
+
+    def fetchone(self):
+        row = self.timed(super().fetchone)
+        if row is not None and self.record is not None:
+            self.record["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.timed(super().fetchmany, self.arraysize if size is None else size)
+        if self.record is not None:
+            self.record["rows"] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.timed(super().fetchall)
+        if self.record is not None:
+            self.record["rows"] += len(rows)
+        return rows
+
+    def __next__(self):
+        row = self.timed(super().__next__)
+        if self.record is not None:
+            self.record["rows"] += 1
+        return row
+
+class FlightConnection(sqlite3.Connection):
+    #sqlite3.Connection itself can't be weakly referenced; the subclass can, so per-connection state is held weakly and
+    #goes away with the connection instead of outliving it under a reusable id()
+    def close(self):
+        forget_connection(self)
+        super().close()
+
+class ConnectionRegistry:
+    #Per-connection values (caches, engines, batch mode). Connections from connect() are held weakly. A plain
+    #sqlite3.Connection can't be, so its entry is keyed by id() and keeps the connection itself alive next to the value,
+    #which stops the id being reused, until forget_connection(conn) is called before closing it.
+    def __init__(self):
+        self.weak = weakref.WeakKeyDictionary()
+        self.plain = {}
+
+    def get(self, conn, default=None):
+        try:
+            return self.weak.get(conn, default)
+        except TypeError:
+            return self.plain.get(id(conn), (None, default))[1]
+
+    def __contains__(self, conn):
+        return self.get(conn, self) is not self
+
+    def __setitem__(self, conn, value):
+        try:
+            self.weak[conn] = value
+        except TypeError:
+            self.plain[id(conn)] = (conn, value)
+
+    def pop(self, conn, default=None):
+        try:
+            return self.weak.pop(conn, default)
+        except TypeError:
+            return self.plain.pop(id(conn), (None, default))[1]
+
+def connection_reference(conn):
+    #Callable returning conn: a weak reference where the connection supports one
+    try:
+        return weakref.ref(conn)
+    except TypeError:
+        return lambda: conn
+
+def forget_connection(conn):
+    #Drops everything held for conn. FlightConnection.close calls it; call it before closing a plain sqlite3 connection.
+    for registry in (dimension_caches, batch_connections, analytics_engines, route_graphs):
+        registry.pop(conn, None)
+
+class InstrumentedConnection(FlightConnection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def trace_statement(sql):
+    #SQLite also reports implicit BEGINs and trigger bodies ("-- TRIGGER ..."), so the text is only taken when it is the
+    #same kind of statement as the one being executed
+    record = getattr(call_state, "pending", None)
+    if record is not None and sql.split(None, 1)[:1] == record["keyword"]:
+        record["sql"] = sql
+        call_state.pending = None
+
+def instrumented(function):
+    @functools.wraps(function)
+    def wrapper(*function_args, **function_kwargs):
+        if not instrumentation["enabled"]:
+            return function(*function_args, **function_kwargs)
+        call = {"statements": []}
+        calls = active_calls()
+        calls.append(call)
+        start = perf_counter()
+        try:
+            return function(*function_args, **function_kwargs)
+        finally:
+            elapsed_ms = (perf_counter() - start) * 1000
+            calls.pop()
+            call_state.pending = None
+            record_call(function.__name__, elapsed_ms, call["statements"])
+    return wrapper
+
+def record_call(function_name, elapsed_ms, statements):
+    rows = sum(statement["rows"] for statement in statements)
+    bucket = sum(1 for bucket in latency_buckets_ms if elapsed_ms > bucket)
+    with query_stats_lock:
+        stats = query_stats.setdefault(function_name, {
+            "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "statements": 0,
+            "histogram": [0] * (len(latency_buckets_ms) + 1)
+        })
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["rows"] += rows
+        stats["statements"] += len(statements)
+        stats["histogram"][bucket] += 1
+
+    threshold = instrumentation["slow_query_ms"]
+    if threshold is not None:
+        for statement in statements:
+            if statement["seconds"] * 1000 >= threshold:
+                log_slow_query(function_name, statement)
+
+def log_slow_query(function_name, statement):
+    #EXPLAIN runs with tracing switched off so it isn't mistaken for the statement being explained
+    statement_conn = statement["conn"]
+    statement_conn.set_trace_callback(None)
+    try:
+        plan = [row[3] for row in statement_conn.execute("EXPLAIN QUERY PLAN " + statement["sql"])]
+    except sqlite3.Error as error:
+        plan = [f"(plan unavailable: {error})"]
+    finally:
+        statement_conn.set_trace_callback(trace_statement)
+    timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+    entry = f"{timestamp} {function_name} {statement['seconds'] * 1000:.1f}ms rows={statement['rows']}\n"
+    entry += "    " + " ".join(statement["sql"].split()) + "\n"
+    entry += "".join(f"    PLAN {detail}\n" for detail in plan)
+    with query_stats_lock:
+        with open(instrumentation["log_path"], "a", encoding="utf-8") as log_file:
+            log_file.write(entry)
+
+def print_query_stats():
+    if not instrumentation["enabled"]:
+        print("\nQuery instrumentation is off. Start the program with --slow-query-ms or --query-stats to enable it.\n")
+        return
+    print("\n -- Query Statistics (slowest total time first) -- \n")
+    bucket_labels = [f"<={bucket}ms" for bucket in latency_buckets_ms] + [f">{latency_buckets_ms[-1]}ms"]
+    with query_stats_lock:
+        snapshot = {function_name: dict(stats, histogram=list(stats["histogram"])) for function_name, stats in query_stats.items()}
+    for function_name, stats in sorted(snapshot.items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        print(f"{function_name}")
+        print(f"    calls: {stats['calls']}  total: {stats['total_ms']:.1f}ms  mean: {stats['total_ms'] / stats['calls']:.2f}ms  "
+              f"max: {stats['max_ms']:.1f}ms  statements: {stats['statements']}  rows: {stats['rows']}")
+        histogram = [f"{label} {count}" for label, count in zip(bucket_labels, stats["histogram"]) if count]
+        print(f"    latency: {', '.join(histogram)}")
+    if not snapshot:
+        print("No instrumented functions have been called yet.")
+    if instrumentation["slow_query_ms"] is not None:
+        print(f"\nStatements over {instrumentation['slow_query_ms']:g}ms are logged to {instrumentation['log_path']}")
+
+def connect(path=None, profile=None, config=None, read_only=False, check_same_thread=True):
+    #Connection factory. Precedence for both the database path and the profile is:
+    #explicit argument, then FLIGHT_DB_PATH/FLIGHT_DB_PROFILE, then the config file, then the built-in default.
+    #read_only connections open the file with mode=ro and leave the journal mode to the writer that created the database.
+    if config is None:
+        config = load_config()
+    path = path or os.environ.get("FLIGHT_DB_PATH") or config.get("database", "path", fallback=default_database_path)
+    profile = profile or os.environ.get("FLIGHT_DB_PROFILE") or config.get("database", "profile", fallback="default")
+    settings = connection_profile(profile, config)
+
+    # Connecting to database (and/or create it if it doesn't yet exist)
+    options = {"cached_statements": 256, "check_same_thread": check_same_thread}
+    if read_only:
+        from urllib.parse import quote
+        path = f"file:{quote(os.path.abspath(path))}?mode=ro"
+        options["uri"] = True
+        settings.pop("journal_mode")
+    if instrumentation["enabled"]:
+        conn = sqlite3.connect(path, factory=InstrumentedConnection, **options)
+        conn.set_trace_callback(trace_statement)
+    else:
+        conn = sqlite3.connect(path, factory=FlightConnection, **options)
+
+    #Protects against deletion of data used as foreign keys e.g. destination_id rows that impact the flights table
+    conn.execute("PRAGMA foreign_keys = ON;")
+
+    for pragma, value in settings.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
 
-print("Tables ready >>>")
+def change_log_triggers(table, key, columns):
+    #AFTER INSERT/UPDATE/DELETE triggers appending to change_log (migration 10). An update lists the columns whose value
+    #changed, comma separated, and updates that change nothing are not logged.
+    changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in columns)
+    changed_list = " || ".join(f"CASE WHEN old.{column} IS NOT new.{column} THEN ',{column}' ELSE '' END" for column in columns)
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_change_log_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO change_log(table_name, row_id, operation) VALUES ('{table}', new.{key}, 'insert');
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_change_log_update AFTER UPDATE ON {table} WHEN {changed} BEGIN
+            INSERT INTO change_log(table_name, row_id, operation, changed_columns)
+            VALUES ('{table}', new.{key}, 'update', substr({changed_list}, 2));
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_change_log_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO change_log(table_name, row_id, operation) VALUES ('{table}', old.{key}, 'delete');
+        END
+        """
+    ]
+
+#Ordered schema migrations. PRAGMA user_version stores how many of these steps the database file has already had applied,
+#so a database that is up to date only costs a single integer read at startup.
+#Never edit a step once it has shipped - append a new one to the end of the list instead.
+migrations = [
+    # 1: Destinations, Pilots and Flights tables (IF NOT EXISTS so databases created before versioning are adopted as-is)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS destinations (
+            destination_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            airport TEXT NOT NULL,
+            city TEXT NOT NULL,
+            country TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS pilots (
+            pilot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            forename TEXT NOT NULL,
+            surname TEXT NOT NULL,
+            license_no TEXT NOT NULL,
+            years_of_xp INTEGER NOT NULL,
+            email TEXT,
+            phone TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS flights (
+            flight_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            origin_id INTEGER NOT NULL,
+            destination_id INTEGER NOT NULL,
+            pilot_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            FOREIGN KEY (origin_id) REFERENCES destinations(destination_id),
+            FOREIGN KEY (destination_id) REFERENCES destinations(destination_id),
+            FOREIGN KEY (pilot_id) REFERENCES pilots(pilot_id)
+        )
+        """
+    ],
+    # 2: Secondary indexes for every column the query functions below filter, join or group on
+    [
+        "CREATE INDEX IF NOT EXISTS idx_flights_status ON flights(status)",
+        "CREATE INDEX IF NOT EXISTS idx_flights_date ON flights(date)",
+        "CREATE INDEX IF NOT EXISTS idx_flights_pilot_id ON flights(pilot_id)",
+        "CREATE INDEX IF NOT EXISTS idx_flights_origin_id ON flights(origin_id)",
+        "CREATE INDEX IF NOT EXISTS idx_flights_destination_id ON flights(destination_id)",
+        "CREATE INDEX IF NOT EXISTS idx_destinations_airport ON destinations(airport)",
+        "CREATE INDEX IF NOT EXISTS idx_destinations_city ON destinations(city)"
+    ],
+    # 3: Sortable departure timestamp ("YYYY-MM-DD HH:MM") kept in step with date/time by SQLite itself, and its index
+    [
+        "ALTER TABLE flights ADD COLUMN departure TEXT GENERATED ALWAYS AS (date || ' ' || time) VIRTUAL",
+        "CREATE INDEX IF NOT EXISTS idx_flights_departure ON flights(departure)"
+    ],
+    # 4: Case-insensitive airport/city indexes, replacing the case-sensitive ones (every airport/city lookup now uses NOCASE)
+    [
+        "DROP INDEX IF EXISTS idx_destinations_airport",
+        "DROP INDEX IF EXISTS idx_destinations_city",
+        "CREATE INDEX IF NOT EXISTS idx_destinations_airport_nocase ON destinations(airport COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_destinations_city_nocase ON destinations(city COLLATE NOCASE)"
+    ],
+    # 5: FTS5 full-text indexes over destinations and pilots (external content, kept in sync by triggers),
+    #    plus fts5vocab tables listing their terms for typo correction
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS destinations_fts USING fts5(
+            airport, city, country,
+            content='destinations', content_rowid='destination_id'
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS pilots_fts USING fts5(
+            forename, surname, license_no, email,
+            content='pilots', content_rowid='pilot_id'
+        )
+        """,
+        "CREATE VIRTUAL TABLE IF NOT EXISTS destinations_fts_terms USING fts5vocab(destinations_fts, 'row')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS pilots_fts_terms USING fts5vocab(pilots_fts, 'row')",
+        """
+        CREATE TRIGGER IF NOT EXISTS destinations_fts_insert AFTER INSERT ON destinations BEGIN
+            INSERT INTO destinations_fts(rowid, airport, city, country)
+            VALUES (new.destination_id, new.airport, new.city, new.country);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS destinations_fts_delete AFTER DELETE ON destinations BEGIN
+            INSERT INTO destinations_fts(destinations_fts, rowid, airport, city, country)
+            VALUES ('delete', old.destination_id, old.airport, old.city, old.country);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS destinations_fts_update AFTER UPDATE ON destinations BEGIN
+            INSERT INTO destinations_fts(destinations_fts, rowid, airport, city, country)
+            VALUES ('delete', old.destination_id, old.airport, old.city, old.country);
+            INSERT INTO destinations_fts(rowid, airport, city, country)
+            VALUES (new.destination_id, new.airport, new.city, new.country);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS pilots_fts_insert AFTER INSERT ON pilots BEGIN
+            INSERT INTO pilots_fts(rowid, forename, surname, license_no, email)
+            VALUES (new.pilot_id, new.forename, new.surname, new.license_no, new.email);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS pilots_fts_delete AFTER DELETE ON pilots BEGIN
+            INSERT INTO pilots_fts(pilots_fts, rowid, forename, surname, license_no, email)
+            VALUES ('delete', old.pilot_id, old.forename, old.surname, old.license_no, old.email);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS pilots_fts_update AFTER UPDATE ON pilots BEGIN
+            INSERT INTO pilots_fts(pilots_fts, rowid, forename, surname, license_no, email)
+            VALUES ('delete', old.pilot_id, old.forename, old.surname, old.license_no, old.email);
+            INSERT INTO pilots_fts(rowid, forename, surname, license_no, email)
+            VALUES (new.pilot_id, new.forename, new.surname, new.license_no, new.email);
+        END
+        """,
+        "INSERT INTO destinations_fts(destinations_fts) VALUES ('rebuild')",
+        "INSERT INTO pilots_fts(pilots_fts) VALUES ('rebuild')"
+    ],
+    # 6: Flight counters per pilot, destination and status, maintained incrementally by triggers on flights so the
+    #    workload and popularity reports never have to GROUP BY the whole flights table
+    [
+        """
+        CREATE TABLE IF NOT EXISTS pilot_flight_counts (
+            pilot_id INTEGER PRIMARY KEY,
+            total_flights INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS destination_flight_counts (
+            destination_id INTEGER PRIMARY KEY,
+            total_flights INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS status_flight_counts (
+            status TEXT PRIMARY KEY,
+            total_flights INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_pilot_flight_counts_total ON pilot_flight_counts(total_flights)",
+        "CREATE INDEX IF NOT EXISTS idx_destination_flight_counts_total ON destination_flight_counts(total_flights)",
+        """
+        CREATE TRIGGER IF NOT EXISTS flights_counts_insert AFTER INSERT ON flights BEGIN
+            INSERT INTO pilot_flight_counts(pilot_id, total_flights) VALUES (new.pilot_id, 1)
+                ON CONFLICT(pilot_id) DO UPDATE SET total_flights = total_flights + 1;
+            INSERT INTO destination_flight_counts(destination_id, total_flights) VALUES (new.destination_id, 1)
+                ON CONFLICT(destination_id) DO UPDATE SET total_flights = total_flights + 1;
+            INSERT INTO status_flight_counts(status, total_flights) VALUES (new.status, 1)
+                ON CONFLICT(status) DO UPDATE SET total_flights = total_flights + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS flights_counts_delete AFTER DELETE ON flights BEGIN
+            UPDATE pilot_flight_counts SET total_flights = total_flights - 1 WHERE pilot_id = old.pilot_id;
+            UPDATE destination_flight_counts SET total_flights = total_flights - 1 WHERE destination_id = old.destination_id;
+            UPDATE status_flight_counts SET total_flights = total_flights - 1 WHERE status = old.status;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS flights_counts_update_pilot AFTER UPDATE OF pilot_id ON flights
+        WHEN old.pilot_id IS NOT new.pilot_id BEGIN
+            UPDATE pilot_flight_counts SET total_flights = total_flights - 1 WHERE pilot_id = old.pilot_id;
+            INSERT INTO pilot_flight_counts(pilot_id, total_flights) VALUES (new.pilot_id, 1)
+                ON CONFLICT(pilot_id) DO UPDATE SET total_flights = total_flights + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS flights_counts_update_destination AFTER UPDATE OF destination_id ON flights
+        WHEN old.destination_id IS NOT new.destination_id BEGIN
+            UPDATE destination_flight_counts SET total_flights = total_flights - 1 WHERE destination_id = old.destination_id;
+            INSERT INTO destination_flight_counts(destination_id, total_flights) VALUES (new.destination_id, 1)
+                ON CONFLICT(destination_id) DO UPDATE SET total_flights = total_flights + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS flights_counts_update_status AFTER UPDATE OF status ON flights
+        WHEN old.status IS NOT new.status BEGIN
+            UPDATE status_flight_counts SET total_flights = total_flights - 1 WHERE status = old.status;
+            INSERT INTO status_flight_counts(status, total_flights) VALUES (new.status, 1)
+                ON CONFLICT(status) DO UPDATE SET total_flights = total_flights + 1;
+        END
+        """,
+        "INSERT OR REPLACE INTO pilot_flight_counts(pilot_id, total_flights) SELECT pilot_id, COUNT(*) FROM flights GROUP BY pilot_id",
+        "INSERT OR REPLACE INTO destination_flight_counts(destination_id, total_flights) SELECT destination_id, COUNT(*) FROM flights GROUP BY destination_id",
+        "INSERT OR REPLACE INTO status_flight_counts(status, total_flights) SELECT status, COUNT(*) FROM flights GROUP BY status"
+    ],
+    # 7: Change counter for the destinations and pilots tables, read by the in-process dimension cache to tell
+    #    whether a commit from another connection touched them or only touched flights
+    [
+        """
+        CREATE TABLE IF NOT EXISTS dimension_changes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            change_count INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO dimension_changes (id, change_count) VALUES (1, 0)",
+        "CREATE TRIGGER IF NOT EXISTS destinations_changes_insert AFTER INSERT ON destinations BEGIN UPDATE dimension_changes SET change_count = change_count + 1; END",
+        "CREATE TRIGGER IF NOT EXISTS destinations_changes_update AFTER UPDATE ON destinations BEGIN UPDATE dimension_changes SET change_count = change_count + 1; END",
+        "CREATE TRIGGER IF NOT EXISTS destinations_changes_delete AFTER DELETE ON destinations BEGIN UPDATE dimension_changes SET change_count = change_count + 1; END",
+        "CREATE TRIGGER IF NOT EXISTS pilots_changes_insert AFTER INSERT ON pilots BEGIN UPDATE dimension_changes SET change_count = change_count + 1; END",
+        "CREATE TRIGGER IF NOT EXISTS pilots_changes_update AFTER UPDATE ON pilots BEGIN UPDATE dimension_changes SET change_count = change_count + 1; END",
+        "CREATE TRIGGER IF NOT EXISTS pilots_changes_delete AFTER DELETE ON pilots BEGIN UPDATE dimension_changes SET change_count = change_count + 1; END"
+    ],
+    # 8: Pilot schedule index for the double-booking checks. It leads with pilot_id, so it replaces idx_flights_pilot_id
+    [
+        "CREATE INDEX IF NOT EXISTS idx_flights_pilot_schedule ON flights(pilot_id, date, time)",
+        "DROP INDEX IF EXISTS idx_flights_pilot_id"
+    ],
+    # 9: Index for the status advancement job, which updates the flights of one status up to a departure time.
+    #    idx_flights_status stays, as the status listings page through it in flight_id order.
+    [
+        "CREATE INDEX IF NOT EXISTS idx_flights_status_departure ON flights(status, date, time)"
+    ],
+    # 10: Change data capture. Every insert, update and delete on flights, pilots and destinations is appended to
+    #     change_log by trigger; change_consumers holds each consumer's checkpoint, and change_log_compaction the
+    #     highest seq deleted by compact_change_log so a reader that fell behind it can tell it has missed changes
+    [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+            changed_columns TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS change_consumers (
+            name TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS change_log_compaction (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            compacted_through INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO change_log_compaction (id, compacted_through) VALUES (1, 0)",
+        *change_log_triggers("flights", "flight_id", ("date", "time", "origin_id", "destination_id", "pilot_id", "status")),
+        *change_log_triggers("pilots", "pilot_id", ("forename", "surname", "license_no", "years_of_xp", "email", "phone")),
+        *change_log_triggers("destinations", "destination_id", ("airport", "city", "country"))
+    ]
+]
+
+def apply_migrations(conn):
+    #Applies any outstanding migration steps, each in its own transaction, and returns True if the schema changed
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current_version > len(migrations):
+        raise ValueError(f"Database schema version {current_version} is newer than this program supports ({len(migrations)}).")
+    for version in range(current_version, len(migrations)):
+        conn.execute("BEGIN")
+        try:
+            for statement in migrations[version]:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"Applied schema migration {version + 1}")
+    return current_version < len(migrations)
 
 #15 sample rows for Destinations
 destinations_data = [
@@ -73,11 +949,6 @@ destinations_data = [
     ("Beijing Capital",        "Beijing",       "China")
 ]
 
-conn.executemany("""
-INSERT INTO destinations (airport, city, country)
-VALUES (?, ?, ?)
-""", destinations_data)
-
 #15 sample rows for Pilots
 pilots_data = [
     ("John",       "Smith",    "LIC12345",  5,  "john.smith@example.com",    "555-1111"),
@@ -97,11 +968,6 @@ pilots_data = [
     ("Daniel",     "Allen",    "LIC55555",  1,  "daniel.a@example.com",      "555-0505")
 ]
 
-conn.executemany("""
-INSERT INTO pilots (forename, surname, license_no, years_of_xp, email, phone)
-VALUES (?, ?, ?, ?, ?, ?)
-""", pilots_data)
-
 #15 sample rows for Flights.
 flights_data = [
     ("2025-01-01", "08:00", 1,  2,  1,  "Arrived"),
@@ -121,169 +987,722 @@ flights_data = [
     ("2025-01-15", "15:05", 3,  15, 15, "Scheduled")
 ]
 
-conn.executemany("""
-INSERT INTO flights (date, time, origin_id, destination_id, pilot_id, status)
-VALUES (?, ?, ?, ?, ?, ?)
-""", flights_data)
+#In-process cache of the small, rarely changing destinations and pilots tables, keyed by id so flight queries only need
+#to read the flights table and names are filled in from memory. A cache belongs to one connection because
+#PRAGMA data_version is only comparable within a connection: it changes when any *other* connection commits, in which
+#case the dimension_changes counter (bumped by triggers, migration 7) shows whether destinations/pilots were involved.
+#Writes made through this connection don't change its data_version, so the functions that write to destinations or
+#pilots call invalidate_dimension_cache themselves. Entries are kept in a ConnectionRegistry, so a closed connection
+#can't hand its cache to a new connection that happens to reuse its id().
+dimension_caches = ConnectionRegistry()
 
-conn.commit()
-print("Data ready >>> \n \n")
+def load_dimension_cache(conn, data_version):
+    return {
+        "data_version": data_version,
+        "change_count": conn.execute("SELECT change_count FROM dimension_changes").fetchone()[0],
+        "destinations": {row[0]: row[1:] for row in conn.execute("SELECT destination_id, airport, city, country FROM destinations")},
+        "pilots": {row[0]: row[1:] for row in conn.execute("SELECT pilot_id, forename, surname, license_no, years_of_xp, email, phone FROM pilots")}
+    }
+
+def dimension_cache(conn):
+    #Returns {"destinations": {destination_id: (airport, city, country)},
+    #         "pilots": {pilot_id: (forename, surname, license_no, years_of_xp, email, phone)}} for this connection
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    cache = dimension_caches.get(conn)
+    if cache is not None and cache["data_version"] != data_version:
+        change_count = conn.execute("SELECT change_count FROM dimension_changes").fetchone()[0]
+        if change_count == cache["change_count"]:
+            cache["data_version"] = data_version
+        else:
+            cache = None
+    if cache is None:
+        cache = load_dimension_cache(conn, data_version)
+        dimension_caches[conn] = cache
+    return cache
 
-#conn.close()
+def invalidate_dimension_cache(conn):
+    dimension_caches.pop(conn, None)
+
+@instrumented
+def seed_sample_data(conn):
+    #Sample data is only ever loaded on request (--seed) and never over the top of existing records
+    for table in ("destinations", "pilots", "flights"):
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            raise ValueError(f"Refusing to seed: the {table} table already contains data.")
+
+    conn.executemany("""
+    INSERT INTO destinations (airport, city, country)
+    VALUES (?, ?, ?)
+    """, destinations_data)
+
+    conn.executemany("""
+    INSERT INTO pilots (forename, surname, license_no, years_of_xp, email, phone)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, pilots_data)
+
+    conn.executemany("""
+    INSERT INTO flights (date, time, origin_id, destination_id, pilot_id, status)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, flights_data)
+
+    conn.commit()
+    invalidate_dimension_cache(conn)
+    print("Sample data loaded >>>")
 
 #Most function names are quite self-explanatory and are used to execute fairly simple queries that relate to the function name
 
-def all_flight_details(conn):
-    all_flights_details_query = """
-    SELECT
-        f.flight_id,
-        f.date,
-        f.time,
-        f.status,
-        o.airport AS origin_airport,
-        o.city AS origin_city,
-        d.airport AS destination_airport,
-        d.city AS destination_city,
-        p.pilot_id AS pilot_id,
-        p.forename AS pilot_forename,
-        p.surname AS pilot_surname
-    FROM flights f
-    LEFT JOIN destinations o ON f.origin_id = o.destination_id
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    LEFT JOIN pilots p ON f.pilot_id = p.pilot_id
-    """
-    cursor = conn.execute(all_flights_details_query)
-    rows = cursor.fetchall()
-    print_flight_details(rows)
+#Flight listings are read with keyset pagination: each page asks for the next page_size rows after the last flight_id seen,
+#so only one page of rows is ever held in memory and the query never has to skip over rows it has already returned.
+#The listing queries below all end with "f.flight_id > ? ORDER BY f.flight_id LIMIT ?" for that reason.
+flight_page_size = 500
+
+missing_destination = (None, None, None)
+
+def resolve_flight_rows(conn, rows):
+    #Turns (flight_id, date, time, status, origin_id, destination_id, pilot_id) rows from the flights table into the
+    #flight details rows (flight_id, date, time, status, origin_airport, origin_city, destination_airport,
+    #destination_city, pilot_id, pilot_forename, pilot_surname) using the dimension cache instead of SQL joins
+    cache = dimension_cache(conn)
+    destinations = cache["destinations"]
+    pilots = cache["pilots"]
+    resolved = []
+    for flight_id, date, time, status, origin_id, destination_id, pilot_id in rows:
+        origin = destinations.get(origin_id, missing_destination)
+        destination = destinations.get(destination_id, missing_destination)
+        pilot = pilots.get(pilot_id)
+        if pilot is None:
+            pilot_details = (None, None, None)
+        else:
+            pilot_details = (pilot_id, pilot[0], pilot[1])
+        resolved.append((flight_id, date, time, status, origin[0], origin[1], destination[0], destination[1], *pilot_details))
+    return resolved
+
+def fetch_flight_page(conn, query, params=(), after_id=0, page_size=flight_page_size):
+    #Returns a single page of flight details rows with flight_id greater than after_id
+    return resolve_flight_rows(conn, conn.execute(query, (*params, after_id, page_size)).fetchall())
+
+def iter_flight_pages(conn, query, params=(), after_id=0, page_size=flight_page_size):
+    #Generator yielding one page at a time, carrying on from the last flight_id of the previous page
+    while True:
+        page = fetch_flight_page(conn, query, params, after_id, page_size)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+def iter_flight_rows(conn, query, params=(), after_id=0, page_size=flight_page_size):
+    #Same as iter_flight_pages but yields individual rows
+    for page in iter_flight_pages(conn, query, params, after_id, page_size):
+        yield from page
+
+#All flight listings share one SELECT and differ only in their WHERE clause, which is composed from the filters below.
+#Combining filters in a single statement lets the planner pick the most selective index instead of intersecting result sets by hand.
+#Only flights columns are selected; airport, city and pilot names are filled in by resolve_flight_rows.
+flight_details_select = """
+SELECT
+    f.flight_id,
+    f.date,
+    f.time,
+    f.status,
+    f.origin_id,
+    f.destination_id,
+    f.pilot_id
+FROM flights f
+"""
+
+#Filter name -> SQL condition. Each condition takes exactly one parameter, except the overnight time window and the
+#*_prefix filters which take two.
+#Airport and city matches are case-insensitive and compared with COLLATE NOCASE so they stay on the NOCASE indexes.
+#A prefix match is written as the range [prefix, prefix + U+10FFFF) rather than LIKE 'prefix%', because SQLite can
+#only turn LIKE into an index range when the pattern is a literal, not a bound parameter.
+flight_filters = {
+    "origin_airport":             "f.origin_id IN (SELECT destination_id FROM destinations WHERE airport = ? COLLATE NOCASE)",
+    "origin_city":                "f.origin_id IN (SELECT destination_id FROM destinations WHERE city = ? COLLATE NOCASE)",
+    "destination_airport":        "f.destination_id IN (SELECT destination_id FROM destinations WHERE airport = ? COLLATE NOCASE)",
+    "destination_city":           "f.destination_id IN (SELECT destination_id FROM destinations WHERE city = ? COLLATE NOCASE)",
+    "origin_airport_prefix":      "f.origin_id IN (SELECT destination_id FROM destinations WHERE airport >= ? COLLATE NOCASE AND airport < ? COLLATE NOCASE)",
+    "origin_city_prefix":         "f.origin_id IN (SELECT destination_id FROM destinations WHERE city >= ? COLLATE NOCASE AND city < ? COLLATE NOCASE)",
+    "destination_airport_prefix": "f.destination_id IN (SELECT destination_id FROM destinations WHERE airport >= ? COLLATE NOCASE AND airport < ? COLLATE NOCASE)",
+    "destination_city_prefix":    "f.destination_id IN (SELECT destination_id FROM destinations WHERE city >= ? COLLATE NOCASE AND city < ? COLLATE NOCASE)",
+    "pilot_id":                   "f.pilot_id = ?",
+    "date":                       "f.date = ?",
+    "date_from":                  "f.date >= ?",
+    "date_to":                    "f.date <= ?",
+    "departure_from":             "f.departure >= ?",
+    "departure_to":               "f.departure <= ?",
+    "time_from":                  "f.time >= ?",
+    "time_to":                    "f.time <= ?",
+    "overnight_window":           "(f.time >= ? OR f.time <= ?)"
+}
+
+@functools.lru_cache(maxsize=256)
+def flight_query_sql(filter_names=(), status_count=0):
+    #Builds (and caches) the SQL for one combination of filters. The text only depends on which filters are used and how
+    #many statuses are given, never on their values, so the same string is reused and sqlite3's statement cache can
+    #hand back the already prepared statement.
+    conditions = [flight_filters[name] for name in filter_names]
+    if status_count:
+        conditions.append(f"f.status IN ({', '.join('?' * status_count)})")
+    conditions.append("f.flight_id > ?")
+    return flight_details_select + "WHERE " + " AND ".join(conditions) + "\nORDER BY f.flight_id\nLIMIT ?\n"
+
+def prefix_range(prefix):
+    #Lower and upper bound of every string starting with prefix
+    return prefix, prefix + "\U0010ffff"
+
+def build_flight_query(origin_airport=None, origin_city=None, destination_airport=None, destination_city=None,
+                       statuses=None, date=None, date_from=None, date_to=None, departure_from=None, departure_to=None,
+                       pilot_id=None, time_from=None, time_to=None, prefix_match=False):
+    #Returns (sql, params) for any combination of filters, ready for iter_flight_pages/fetch_flight_page.
+    #Airport and city names are matched case-insensitively, and with prefix_match=True "heath" also finds "Heathrow".
+    #Dates are inclusive YYYY-MM-DD bounds, departures inclusive "YYYY-MM-DD HH:MM" bounds and times inclusive HH:MM bounds.
+    #A time window whose start is later than its end (e.g. 22:00 - 04:00) is treated as wrapping past midnight.
+    filter_names = []
+    params = []
+    if departure_from is not None:
+        departure_from = normalise_departure(departure_from, upper=False)
+    if departure_to is not None:
+        departure_to = normalise_departure(departure_to, upper=True)
+    for name, value in (("origin_airport", origin_airport), ("origin_city", origin_city),
+                        ("destination_airport", destination_airport), ("destination_city", destination_city)):
+        if value is not None and prefix_match:
+            filter_names.append(name + "_prefix")
+            params.extend(prefix_range(value))
+        elif value is not None:
+            filter_names.append(name)
+            params.append(value)
+    for name, value in (("pilot_id", pilot_id), ("date", date), ("date_from", date_from), ("date_to", date_to),
+                        ("departure_from", departure_from), ("departure_to", departure_to)):
+        if value is not None:
+            filter_names.append(name)
+            params.append(value)
+
+    if time_from is not None and time_to is not None and time_from > time_to:
+        filter_names.append("overnight_window")
+        params.extend((time_from, time_to))
+    else:
+        for name, value in (("time_from", time_from), ("time_to", time_to)):
+            if value is not None:
+                filter_names.append(name)
+                params.append(value)
+
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    statuses = sorted(set(statuses or ()))
+    params.extend(statuses)
+    return flight_query_sql(tuple(filter_names), len(statuses)), tuple(params)
+
+@instrumented
+def search_flights(conn, after_id=0, page_size=flight_page_size, **filters):
+    sql, params = build_flight_query(**filters)
+    print_flight_pages(iter_flight_pages(conn, sql, params, after_id, page_size))
+    print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
+
+all_flight_details_query = flight_query_sql()
+
+@instrumented
+def all_flight_details(conn, after_id=0, page_size=flight_page_size):
+    print_flight_pages(iter_flight_pages(conn, all_flight_details_query, (), after_id, page_size))
     print("All flight details retrieved and displayed. Now returning to main menu... \n")
     
 
-def flights_by_airport(conn, airport):
-    filter_destination_query = """
-    SELECT
-        f.flight_id,
-        f.date,
-        f.time,
-        f.status,
-        o.airport AS origin_airport,
-        o.city AS origin_city,
-        d.airport AS destination_airport,
-        d.city AS destination_city,
-        p.pilot_id AS pilot_id,
-        p.forename AS pilot_forename,
-        p.surname AS pilot_surname
-    FROM flights f
-    LEFT JOIN destinations o ON f.origin_id = o.destination_id
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    LEFT JOIN pilots p ON f.pilot_id = p.pilot_id
-    WHERE d.airport = ?
-    """
-    cursor = conn.execute(filter_destination_query, (airport,))
-    rows = cursor.fetchall()
-    print_flight_details(rows)
+flights_by_airport_query = flight_query_sql(("destination_airport",))
+flights_by_airport_prefix_query = flight_query_sql(("destination_airport_prefix",))
+
+@instrumented
+def flights_by_airport(conn, airport, prefix=False, after_id=0, page_size=flight_page_size):
+    #Case-insensitive; with prefix=True any airport starting with the given text matches
+    if prefix:
+        query, params = flights_by_airport_prefix_query, prefix_range(airport)
+    else:
+        query, params = flights_by_airport_query, (airport,)
+    print_flight_pages(iter_flight_pages(conn, query, params, after_id, page_size))
     print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
 
-def flights_by_city(conn, city):
-    filter_destination_query = """
-    SELECT
-        f.flight_id,
-        f.date,
-        f.time,
-        f.status,
-        o.airport AS origin_airport,
-        o.city AS origin_city,
-        d.airport AS destination_airport,
-        d.city AS destination_city,
-        p.pilot_id AS pilot_id,
-        p.forename AS pilot_forename,
-        p.surname AS pilot_surname
-    FROM flights f
-    LEFT JOIN destinations o ON f.origin_id = o.destination_id
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    LEFT JOIN pilots p ON f.pilot_id = p.pilot_id
-    WHERE d.city = ?
-    """
-    cursor = conn.execute(filter_destination_query, (city,))
-    rows = cursor.fetchall()
-    print_flight_details(rows)
+flights_by_city_query = flight_query_sql(("destination_city",))
+flights_by_city_prefix_query = flight_query_sql(("destination_city_prefix",))
+
+@instrumented
+def flights_by_city(conn, city, prefix=False, after_id=0, page_size=flight_page_size):
+    #Case-insensitive; with prefix=True any city starting with the given text matches
+    if prefix:
+        query, params = flights_by_city_prefix_query, prefix_range(city)
+    else:
+        query, params = flights_by_city_query, (city,)
+    print_flight_pages(iter_flight_pages(conn, query, params, after_id, page_size))
     print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
 
-def flights_by_status(conn, status):
-    filter_flight_status_query = """
-    SELECT
-        f.flight_id,
-        f.date,
-        f.time,
-        f.status,
-        o.airport AS origin_airport,
-        o.city AS origin_city,
-        d.airport AS destination_airport,
-        d.city AS destination_city,
-        p.pilot_id AS pilot_id,
-        p.forename AS pilot_forename,
-        p.surname AS pilot_surname
-    FROM flights f
-    LEFT JOIN destinations o ON f.origin_id = o.destination_id
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    LEFT JOIN pilots p ON f.pilot_id = p.pilot_id
-    WHERE f.status = ?
-    """
-    cursor = conn.execute(filter_flight_status_query, (status,))
-    rows = cursor.fetchall()
-    print_flight_details(rows)
+flights_by_status_query = flight_query_sql(status_count=1)
+
+@instrumented
+def flights_by_status(conn, status, after_id=0, page_size=flight_page_size):
+    print_flight_pages(iter_flight_pages(conn, flights_by_status_query, (status,), after_id, page_size))
     print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
 
-def flights_filtered_by_date(conn, date):
-    filter_by_date = """
-    SELECT
-        f.flight_id,
-        f.date,
-        f.time,
-        f.status,
-        o.airport AS origin_airport,
-        o.city AS origin_city,
-        d.airport AS destination_airport,
-        d.city AS destination_city,
-        p.pilot_id AS pilot_id,
-        p.forename AS pilot_forename,
-        p.surname AS pilot_surname
-    FROM flights f
-    LEFT JOIN destinations o ON f.origin_id = o.destination_id
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    LEFT JOIN pilots p ON f.pilot_id = p.pilot_id
-    WHERE f.date = ?
-    """
-    cursor = conn.execute(filter_by_date, (date,))
-    rows = cursor.fetchall()
-    print_flight_details(rows)
+flights_filtered_by_date_query = flight_query_sql(("date",))
+
+@instrumented
+def flights_filtered_by_date(conn, date, after_id=0, page_size=flight_page_size):
+    print_flight_pages(iter_flight_pages(conn, flights_filtered_by_date_query, (date,), after_id, page_size))
+    print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
+
+#Departure range queries run on flights.departure, a generated "YYYY-MM-DD HH:MM" column that sorts chronologically, so
+#"06:00 on the 3rd to 18:00 on the 5th" is one range scan of idx_flights_departure. Results come back in departure order and
+#are paged on (departure, flight_id), which the same index also satisfies without a sort.
+def normalise_departure(value, upper):
+    #Accepts "YYYY-MM-DD", "YYYY-MM-DD HH:MM" or "YYYY-MM-DDTHH:MM". A bare date covers the whole day.
+    value = value.strip().replace("T", " ")
+    if len(value) == 10:
+        value += " 23:59" if upper else " 00:00"
+    return value[:16]
+
+@functools.lru_cache(maxsize=64)
+def departure_query_sql(lower_op, upper_op, descending, has_cursor):
+    conditions = []
+    if lower_op:
+        conditions.append(f"f.departure {lower_op} ?")
+    if upper_op:
+        conditions.append(f"f.departure {upper_op} ?")
+    if has_cursor:
+        conditions.append(f"(f.departure, f.flight_id) {'<' if descending else '>'} (?, ?)")
+    where = "WHERE " + " AND ".join(conditions) + "\n" if conditions else ""
+    direction = "DESC" if descending else "ASC"
+    return flight_details_select + where + f"ORDER BY f.departure {direction}, f.flight_id {direction}\nLIMIT ?\n"
+
+def iter_departure_pages(conn, start=None, end=None, include_start=True, include_end=False, descending=False,
+                         page_size=flight_page_size, after=None):
+    #Generator yielding pages of flights departing between start and end. Either bound can be None (open ended) and each
+    #can be closed or open with include_start/include_end. after=(departure, flight_id) resumes after that row.
+    lower_op = (">=" if include_start else ">") if start is not None else None
+    upper_op = ("<=" if include_end else "<") if end is not None else None
+    bounds = []
+    if start is not None:
+        bounds.append(normalise_departure(start, upper=not include_start))
+    if end is not None:
+        bounds.append(normalise_departure(end, upper=include_end))
+
+    cursor_key = tuple(after) if after is not None else ()
+    while True:
+        query = departure_query_sql(lower_op, upper_op, descending, bool(cursor_key))
+        page = resolve_flight_rows(conn, conn.execute(query, (*bounds, *cursor_key, page_size)).fetchall())
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        cursor_key = (f"{last[1]} {last[2]}", last[0])
+
+@instrumented
+def flights_departing_between(conn, start=None, end=None, include_start=True, include_end=False, descending=False,
+                              page_size=flight_page_size):
+    print_flight_pages(iter_departure_pages(conn, start, end, include_start, include_end, descending, page_size))
+    print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
+
+flights_departing_between_query = departure_query_sql(">=", "<", False, True)
+
+#Keyword search over pilots (forename, surname, license_no, email) and destinations (airport, city, country) using the
+#FTS5 indexes from migration 5. Every word of the search must match something: a word matches a term that starts with it
+#("heath" -> heathrow), or failing that a close spelling of an indexed term ("frankfrut" -> frankfurt).
+search_typo_cutoff = 0.75
+
+def search_words(text):
+    import re
+    return re.findall(r"\w+", text.lower())
+
+def word_match_expression(conn, word, terms_table):
+    #FTS5 query for one search word: a prefix query, plus close spellings from the fts5vocab table when nothing starts with
+    #the word. Candidate spellings are limited to terms with the same first letter so the vocabulary lookup is a range scan.
+    if conn.execute(f"SELECT 1 FROM {terms_table} WHERE term >= ? AND term < ? LIMIT 1", prefix_range(word)).fetchone():
+        return f'"{word}"*'
+    import difflib
+    candidates = [row[0] for row in conn.execute(f"SELECT term FROM {terms_table} WHERE term >= ? AND term < ?", prefix_range(word[0]))]
+    close_terms = difflib.get_close_matches(word, candidates, n=3, cutoff=search_typo_cutoff)
+    if not close_terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in close_terms)
+
+def search_expressions(conn, text):
+    #[(pilot_expression, destination_expression), ...] with one pair per search word; either side is None if the word
+    #can't match that table at all
+    return [(word_match_expression(conn, word, "pilots_fts_terms"), word_match_expression(conn, word, "destinations_fts_terms"))
+            for word in search_words(text)]
+
+@instrumented
+def search_directory(conn, text, limit=10):
+    #Returns ([(pilot_id, forename, surname), ...], [(destination_id, airport, city, country), ...]), each ranked by bm25.
+    #A pilot or destination is listed if it matches every search word that can match its table.
+    expressions = search_expressions(conn, text)
+    pilot_query = " AND ".join(f"({pilot})" for pilot, _ in expressions if pilot)
+    destination_query = " AND ".join(f"({destination})" for _, destination in expressions if destination)
+    pilots = []
+    destinations = []
+    if pilot_query:
+        pilots = conn.execute("""
+        SELECT p.pilot_id, p.forename, p.surname
+        FROM pilots_fts JOIN pilots p ON p.pilot_id = pilots_fts.rowid
+        WHERE pilots_fts MATCH ?
+        ORDER BY pilots_fts.rank
+        LIMIT ?
+        """, (pilot_query, limit)).fetchall()
+    if destination_query:
+        destinations = conn.execute("""
+        SELECT d.destination_id, d.airport, d.city, d.country
+        FROM destinations_fts JOIN destinations d ON d.destination_id = destinations_fts.rowid
+        WHERE destinations_fts MATCH ?
+        ORDER BY destinations_fts.rank
+        LIMIT ?
+        """, (destination_query, limit)).fetchall()
+    return pilots, destinations
+
+#One condition per search word: the word must match the flight's pilot, origin or destination.
+#SQLite answers the OR with a union of idx_flights_pilot_schedule/origin_id/destination_id lookups.
+keyword_conditions = {
+    "pilot":       "f.pilot_id IN (SELECT rowid FROM pilots_fts WHERE pilots_fts MATCH ?)",
+    "destination": "f.origin_id IN (SELECT rowid FROM destinations_fts WHERE destinations_fts MATCH ?) "
+                   "OR f.destination_id IN (SELECT rowid FROM destinations_fts WHERE destinations_fts MATCH ?)"
+}
+
+@functools.lru_cache(maxsize=64)
+def keyword_query_sql(word_shapes):
+    #word_shapes has one (matches_pilots, matches_destinations) pair per search word
+    conditions = []
+    for matches_pilots, matches_destinations in word_shapes:
+        parts = []
+        if matches_pilots:
+            parts.append(keyword_conditions["pilot"])
+        if matches_destinations:
+            parts.append(keyword_conditions["destination"])
+        conditions.append("(" + " OR ".join(parts) + ")")
+    conditions.append("f.flight_id > ?")
+    return flight_details_select + "WHERE " + "\n  AND ".join(conditions) + "\nORDER BY f.flight_id\nLIMIT ?\n"
+
+def build_keyword_query(conn, text):
+    #Returns (sql, params) for flights matching every word of text, or None if some word matches nothing at all
+    expressions = search_expressions(conn, text)
+    if not expressions or any(pilot is None and destination is None for pilot, destination in expressions):
+        return None
+    params = []
+    for pilot, destination in expressions:
+        if pilot:
+            params.append(pilot)
+        if destination:
+            params.extend((destination, destination))
+    shapes = tuple((pilot is not None, destination is not None) for pilot, destination in expressions)
+    return keyword_query_sql(shapes), tuple(params)
+
+@instrumented
+def flights_by_keywords(conn, text, after_id=0, page_size=flight_page_size):
+    #e.g. "sarah frankfurt" lists Sarah's flights to or from Frankfurt, after showing the best matching pilots and destinations
+    pilots, destinations = search_directory(conn, text)
+    print("\nMatching pilots:")
+    for pilot_id, forename, surname in pilots:
+        print(f"  {pilot_id}: {forename} {surname}")
+    print("Matching destinations:")
+    for destination_id, airport, city, country in destinations:
+        print(f"  {destination_id}: {airport} - {city} - {country}")
+
+    keyword_query = build_keyword_query(conn, text)
+    if keyword_query is None:
+        print("\nNo pilots or destinations match every word of your search.\n")
+        return
+    sql, params = keyword_query
+    print_flight_pages(iter_flight_pages(conn, sql, params, after_id, page_size))
     print("\nQuery complete. Results retrieved.\nIf you see no results displayed, there were either no matches for your search criteria or you may need to double check for typos in your input and try again.\n")
     
+flight_details_template = (
+    "Flight ID:           {}\n"
+    "Date:                {}\n"
+    "Time:                {}\n"
+    "Status:              {}\n"
+    "Origin Airport:      {}\n"
+    "Origin City:         {}\n"
+    "Destination Airport: {}\n"
+    "Destination City:    {}\n"
+    "Pilot ID:            {}\n"
+    "Pilot Forename:      {}\n"
+    "Pilot Surname:       {}\n"
+    "\n---\n\n"
+)
+
 def print_flight_details(rows):
+    #Renders the whole page into one string so it reaches the terminal in a single write rather than twelve prints per row
+    sys.stdout.write("".join(flight_details_template.format(*row) for row in rows))
+
+def print_flight_pages(pages):
     print("\n -- All Flights Details: -- \n")
-    for row in rows:
-        flight_id, date, time, status, origin_airport, origin_city, dest_airport, dest_city, pilot_id, pilot_forename, pilot_surname = row
-
-        print(f"Flight ID:           {flight_id}")
-        print(f"Date:                {date}")
-        print(f"Time:                {time}")
-        print(f"Status:              {status}")
-        print(f"Origin Airport:      {origin_airport}")
-        print(f"Origin City:         {origin_city}")
-        print(f"Destination Airport: {dest_airport}")
-        print(f"Destination City:    {dest_city}")
-        print(f"Pilot ID:            {pilot_id}")
-        print(f"Pilot Forename:      {pilot_forename}")
-        print(f"Pilot Surname:       {pilot_surname}")
-        print("\n---\n")
+    for page in pages:
+        print_flight_details(page)
     
-def insert_new_flight_record(conn, date, time, origin_id, destination_id, pilot_id, status):
+#The write functions below commit through these helpers so that batch mode (begin_batch/end_batch) can run many of them inside
+#one transaction on the same connection. Outside a batch they behave exactly like conn.execute("BEGIN")/commit/rollback.
+#Connections are registered like the caches, so one that is dropped mid-batch can't leave a reused id() stuck in batch mode.
+batch_connections = ConnectionRegistry()
+
+def begin_write(conn, mode=""):
+    if conn not in batch_connections:
+        conn.execute(f"BEGIN {mode}".strip())
+
+def commit_write(conn):
+    if conn not in batch_connections:
+        conn.commit()
+
+def rollback_write(conn):
+    if conn not in batch_connections:
+        conn.rollback()
+
+def begin_batch(conn):
+    #Opens a transaction that the write functions join instead of committing themselves, until end_batch is called
+    conn.execute("BEGIN IMMEDIATE")
+    batch_connections[conn] = True
+
+def end_batch(conn, commit=True):
+    batch_connections.pop(conn, None)
+    if commit:
+        conn.commit()
+    else:
+        conn.rollback()
+
+#Pilot double-booking. Flights only record a departure, so a pilot is double-booked when two of their flights that aren't
+#cancelled depart less than turnaround_minutes apart (identical departures always clash, even with a turnaround of 0).
+#The writes that can create a clash - adding a flight, assigning a pilot and changing a flight's date, time or status -
+#check the flights they changed before committing, and roll back with a ValueError naming the clashing flights unless
+#called with allow_conflicts=True. Each check is one range probe of idx_flights_pilot_schedule (migration 8) covering
+#the pilot's flights from the day before to the day after.
+pilot_turnaround_minutes = 60
+pilot_conflict_columns = {"pilot_id", "date", "time", "status"}
+
+pilot_conflict_query = """
+SELECT f.pilot_id, f.flight_id, f.departure, o.flight_id, o.departure
+FROM flights f
+JOIN flights o ON o.pilot_id = f.pilot_id AND o.date BETWEEN date(f.date, '-1 day') AND date(f.date, '+1 day')
+WHERE f.flight_id = ?
+  AND o.flight_id != f.flight_id
+  AND f.status != 'Cancelled'
+  AND o.status != 'Cancelled'
+  AND (o.departure = f.departure OR round(abs(julianday(o.departure) - julianday(f.departure)) * 1440) < ?)
+"""
+
+def pilot_conflicts(conn, flight_ids, turnaround_minutes=None):
+    #[(pilot_id, flight_id, departure, other_flight_id, other_departure), ...] for every clash involving the given flights,
+    #each pair listed once
+    if turnaround_minutes is None:
+        turnaround_minutes = pilot_turnaround_minutes
+    conflicts = {}
+    for flight_id in flight_ids:
+        for pilot_id, first_id, first_departure, second_id, second_departure in conn.execute(pilot_conflict_query, (flight_id, turnaround_minutes)):
+            if first_id > second_id:
+                first_id, first_departure, second_id, second_departure = second_id, second_departure, first_id, first_departure
+            conflicts[(first_id, second_id)] = (pilot_id, first_id, first_departure, second_id, second_departure)
+    return sorted(conflicts.values())
+
+def pilot_conflict_message(conflicts):
+    described = [f"pilot {pilot_id} has flight {first_id} at {first_departure} and flight {second_id} at {second_departure}"
+                 for pilot_id, first_id, first_departure, second_id, second_departure in conflicts[:5]]
+    if len(conflicts) > 5:
+        described.append(f"{len(conflicts) - 5} more")
+    return "Pilot double-booked: " + "; ".join(described)
+
+def check_pilot_conflicts(conn, flight_ids, allow_conflicts=False):
+    #Runs inside the write's transaction after the change has been made, and rolls it back if the change caused a clash
+    if allow_conflicts:
+        return
+    conflicts = pilot_conflicts(conn, flight_ids)
+    if conflicts:
+        rollback_write(conn)
+        raise ValueError(pilot_conflict_message(conflicts))
+
+#Departure as whole minutes since 1970-01-01, or NULL if the date or time doesn't parse
+departure_minutes_sql = "CAST(round((julianday(departure) - 2440587.5) * 1440) AS INTEGER)"
+
+#Whole-table audit: one pass over the non-cancelled flights in (pilot_id, date, time) order, which the schedule index
+#delivers without a sort. Only the pilot's flights inside the turnaround window behind the current one are kept, so it
+#runs in O(n) time and O(window) memory instead of a quadratic self-join. Departures that don't parse are skipped.
+pilot_schedule_sweep_query = f"""
+SELECT pilot_id, flight_id, departure, {departure_minutes_sql}
+FROM flights
+WHERE status != 'Cancelled'
+ORDER BY pilot_id, date, time
+"""
+
+def sweep_pilot_conflicts(conn, turnaround_minutes=None):
+    import collections
+    if turnaround_minutes is None:
+        turnaround_minutes = pilot_turnaround_minutes
+    window_minutes = max(turnaround_minutes, 1)
+    conflicts = []
+    window = collections.deque()
+    current_pilot = None
+    for pilot_id, flight_id, departure, minutes in conn.execute(pilot_schedule_sweep_query):
+        if minutes is None:
+            continue
+        if pilot_id != current_pilot:
+            window.clear()
+            current_pilot = pilot_id
+        while window and minutes - window[0][0] >= window_minutes:
+            window.popleft()
+        for _, other_id, other_departure in window:
+            conflicts.append((pilot_id, other_id, other_departure, flight_id, departure))
+        window.append((minutes, flight_id, departure))
+    return conflicts
+
+@instrumented
+def find_pilot_conflicts(conn, turnaround_minutes=None):
+    conflicts = sweep_pilot_conflicts(conn, turnaround_minutes)
+    pilots = dimension_cache(conn)["pilots"]
+    print("\nFormat: pilot_id, pilot_forename, pilot_surname, flight_id, departure, other_flight_id, other_departure")
+    for pilot_id, *flights in conflicts:
+        forename, surname = pilots.get(pilot_id, (None, None))[:2]
+        print((pilot_id, forename, surname, *flights))
+    print(f"\n{len(conflicts)} double-booked flight pairs found\n")
+    return conflicts
+
+#Automatic pilot assignment. Every Scheduled flight in the date range is given a pilot again, in departure order, with the
+#greedy interval partitioning algorithm: pilots who are free wait in a heap ordered by workload, pilots who are flying
+#wait in a heap ordered by the minute they are free again, and each flight takes the least loaded free pilot.
+#A pilot is free turnaround_minutes + rest_minutes after their last departure, never flies within that gap of one of
+#their flights that isn't being re-planned (Boarding/Departed flights, or Scheduled ones just outside the range) and,
+#optionally, flies at most max_flights_per_day. Workload is the number of flights the plan has given the pilot divided by
+#1 + years_of_xp * scheduler_experience_weight, so experienced pilots take a proportionally larger share, with ties going
+#to the pilot with fewer flights outside the re-planned ones (pilot_flight_counts). It runs in O((flights + pilots) log pilots).
+#Flights no pilot can take keep their current pilot, are reported and block that pilot like a fixed flight from then on.
+#A kept flight can still clash with one planned before it, so the changed flights get the usual double-booking check
+#before commit. The plan is read and written in one IMMEDIATE transaction, inside a savepoint: a dry run makes the same
+#changes and checks, then rolls back to the savepoint and prints the proposed changes instead. The savepoint is what
+#undoes them inside a batch, where rollback_write leaves the batch's transaction alone.
+scheduler_experience_weight = 0.05
+
+auto_assign_flights_query = f"""
+SELECT flight_id, pilot_id, departure, {departure_minutes_sql} AS minutes
+FROM flights
+WHERE status = 'Scheduled' AND date BETWEEN ? AND ? AND minutes IS NOT NULL
+ORDER BY date, time, flight_id
+"""
+
+auto_assign_fixed_query = f"""
+SELECT pilot_id, {departure_minutes_sql} AS minutes
+FROM flights
+WHERE date BETWEEN date(?, '-1 day') AND date(?, '+1 day')
+  AND status != 'Cancelled'
+  AND NOT (status = 'Scheduled' AND date BETWEEN ? AND ?)
+  AND minutes IS NOT NULL
+"""
+
+def plan_pilot_assignments(flights, pilot_experience, fixed_departures, base_loads, gap_minutes, max_flights_per_day=None):
+    #flights: [(flight_id, current_pilot_id, departure, minutes)] in departure order, pilot_experience: {pilot_id: years_of_xp},
+    #fixed_departures: {pilot_id: sorted departure minutes}, base_loads: {pilot_id: flights}.
+    #Returns ([(flight_id, departure, current_pilot_id, new_pilot_id)], [flight_id of each flight nobody could take])
+    import bisect
+    import heapq
+    weights = {pilot_id: 1 + max(years_of_xp or 0, 0) * scheduler_experience_weight for pilot_id, years_of_xp in pilot_experience.items()}
+    loads = {pilot_id: 0 for pilot_id in pilot_experience}
+    daily_flights = {}
+
+    def workload(pilot_id):
+        return loads[pilot_id] / weights[pilot_id], base_loads.get(pilot_id, 0) / weights[pilot_id], pilot_id
+
+    available = [workload(pilot_id) for pilot_id in pilot_experience]
+    heapq.heapify(available)
+    busy = []
+    plan = []
+    unassigned = []
+    for flight_id, current_pilot_id, departure, minutes in flights:
+        while busy and busy[0][0] <= minutes:
+            pilot_id = heapq.heappop(busy)[1]
+            heapq.heappush(available, workload(pilot_id))
+        chosen = None
+        while available:
+            pilot_id = heapq.heappop(available)[2]
+            fixed = fixed_departures.get(pilot_id)
+            if fixed:
+                index = bisect.bisect_right(fixed, minutes - gap_minutes)
+                if index < len(fixed) and fixed[index] < minutes + gap_minutes:
+                    heapq.heappush(busy, (fixed[index] + gap_minutes, pilot_id))
+                    continue
+            day = minutes // 1440
+            if max_flights_per_day and daily_flights.get((pilot_id, day), 0) >= max_flights_per_day:
+                heapq.heappush(busy, ((day + 1) * 1440, pilot_id))
+                continue
+            chosen = pilot_id
+            break
+        if chosen is None:
+            #The flight keeps its current pilot, who then can't be given another flight within the gap of it
+            unassigned.append(flight_id)
+            bisect.insort(fixed_departures.setdefault(current_pilot_id, []), minutes)
+            daily_flights[(current_pilot_id, minutes // 1440)] = daily_flights.get((current_pilot_id, minutes // 1440), 0) + 1
+            continue
+        loads[chosen] += 1
+        daily_flights[(chosen, minutes // 1440)] = daily_flights.get((chosen, minutes // 1440), 0) + 1
+        heapq.heappush(busy, (minutes + gap_minutes, chosen))
+        plan.append((flight_id, departure, current_pilot_id, chosen))
+    return plan, unassigned
+
+@instrumented
+def auto_assign_pilots(conn, date_from, date_to, dry_run=False, turnaround_minutes=None, rest_minutes=0, max_flights_per_day=None):
+    if turnaround_minutes is None:
+        turnaround_minutes = pilot_turnaround_minutes
+    gap_minutes = max(turnaround_minutes + rest_minutes, 1)
+    start = perf_counter()
+    begin_write(conn, "IMMEDIATE")
+    conn.execute("SAVEPOINT auto_assign")
+    try:
+        flights = conn.execute(auto_assign_flights_query, (date_from, date_to)).fetchall()
+        fixed_departures = {}
+        for pilot_id, minutes in conn.execute(auto_assign_fixed_query, (date_from, date_to, date_from, date_to)):
+            fixed_departures.setdefault(pilot_id, []).append(minutes)
+        for departures in fixed_departures.values():
+            departures.sort()
+        base_loads = dict(conn.execute("SELECT pilot_id, total_flights FROM pilot_flight_counts"))
+        for _, pilot_id, _, _ in flights:
+            base_loads[pilot_id] = base_loads.get(pilot_id, 0) - 1
+        pilot_experience = {pilot_id: pilot[3] for pilot_id, pilot in dimension_cache(conn)["pilots"].items()}
+
+        plan, unassigned = plan_pilot_assignments(flights, pilot_experience, fixed_departures, base_loads, gap_minutes, max_flights_per_day)
+        changes = [(new_pilot_id, flight_id) for flight_id, _, current_pilot_id, new_pilot_id in plan if new_pilot_id != current_pilot_id]
+        conn.executemany("UPDATE flights SET pilot_id = ? WHERE flight_id = ?", changes)
+        conflicts = pilot_conflicts(conn, [flight_id for _, flight_id in changes], turnaround_minutes)
+        if conflicts:
+            raise ValueError(pilot_conflict_message(conflicts))
+        if dry_run:
+            conn.execute("ROLLBACK TO auto_assign")
+        conn.execute("RELEASE auto_assign")
+        if dry_run:
+            rollback_write(conn)
+        else:
+            commit_write(conn)
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK TO auto_assign")
+            conn.execute("RELEASE auto_assign")
+        rollback_write(conn)
+        raise
+    elapsed = perf_counter() - start
+
+    if dry_run:
+        print("\nProposed plan. Format: flight_id, departure, current_pilot_id, new_pilot_id")
+        sys.stdout.write("".join(f"{row}\n" for row in plan if row[2] != row[3]))
+    new_flights = {}
+    for _, _, _, pilot_id in plan:
+        new_flights[pilot_id] = new_flights.get(pilot_id, 0) + 1
+    busiest = max(new_flights.values(), default=0)
+    print(f"\n{len(flights)} scheduled flights between {date_from} and {date_to} planned in {elapsed:.2f}s: "
+          f"{len(changes)} pilot changes {'proposed' if dry_run else 'made'}, {len(plan) - len(changes)} kept their pilot, "
+          f"{len(new_flights)} pilots used (at most {busiest} flights each)")
+    if unassigned:
+        print(f"No pilot was free for {len(unassigned)} flights, which keep their current pilot: "
+              f"{', '.join(str(flight_id) for flight_id in unassigned[:20])}{' ...' if len(unassigned) > 20 else ''}")
+    return plan, unassigned
+
+@instrumented
+def insert_new_flight_record(conn, date, time, origin_id, destination_id, pilot_id, status, allow_conflicts=False):
     add_flight = """
     INSERT INTO flights (date, time, origin_id, destination_id, pilot_id, status)
     VALUES (?, ?, ?, ?, ?, ?)
     """
     cursor = conn.execute(add_flight, (date, time, origin_id, destination_id, pilot_id, status))
-    conn.commit()
     new_flight_id = cursor.lastrowid
+    check_pilot_conflicts(conn, [new_flight_id], allow_conflicts)
+    commit_write(conn)
     print(f"New flight {new_flight_id} addition successful")
     print()
     print("The following information has been stored in the database: \n")
@@ -291,81 +1710,458 @@ def insert_new_flight_record(conn, date, time, origin_id, destination_id, pilot_
     rows = cursor.fetchall()
     for row in rows:
         print(row)
+    return new_flight_id
 
-def update_flight_date(conn, flight_id, new_date):
+flight_import_columns = ("date", "time", "origin_id", "destination_id", "pilot_id", "status")
+
+def read_flight_file(path):
+    #Generator that yields one flight tuple at a time so the import file is never held in memory as a whole.
+    #.jsonl/.ndjson files hold one JSON object per line, anything else is read as CSV with a header row.
+    #A line that can't be read raises ValueError naming the file line and what was wrong with it.
+    import csv
+    import json
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as import_file:
+            for line_number, line in enumerate(import_file, 1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                        flight = tuple(record[column] for column in flight_import_columns)
+                    except json.JSONDecodeError as error:
+                        raise ValueError(f"{path} line {line_number} is not valid JSON ({error})")
+                    except (KeyError, TypeError) as error:
+                        raise ValueError(f"{path} line {line_number} is not a flight object with {', '.join(flight_import_columns)} ({error!r})")
+                    yield flight
+    else:
+        with open(path, newline="", encoding="utf-8") as import_file:
+            reader = csv.DictReader(import_file)
+            try:
+                missing = [column for column in flight_import_columns if column not in (reader.fieldnames or [])]
+                if missing:
+                    raise ValueError(f"{path} line 1: the header has no {', '.join(missing)} column")
+                for record in reader:
+                    flight = tuple(record[column] for column in flight_import_columns)
+                    if None in flight:
+                        raise ValueError(f"{path} line {reader.line_num} has fewer values than the header")
+                    yield flight
+            except csv.Error as error:
+                raise ValueError(f"{path} line {reader.line_num}: {error}")
+
+def load_flight_rows(conn, rows, batch_size=10000, allow_conflicts=False):
+    #Bulk loads flight tuples with one executemany and one transaction per batch instead of a commit per row.
+    #synchronous=OFF and a larger page cache are only used for the duration of the load and restored afterwards.
+    #Each batch's new flights are checked for pilot double-bookings (against each other and the existing flights) before
+    #it commits, and the load stops at a batch that has one unless allow_conflicts is set.
+    #Returns the number of rows loaded and the time taken in seconds.
+    add_flight = """
+    INSERT INTO flights (date, time, origin_id, destination_id, pilot_id, status)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """
+    previous_synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    previous_cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+
+    rows = iter(rows)
+    loaded = 0
+    start = perf_counter()
+    try:
+        while True:
+            try:
+                batch = list(itertools.islice(rows, batch_size))
+            except ValueError as error:
+                #Nothing from the unfinished batch has been inserted yet, so the rows before it are all that is kept
+                print(f"Load stopped after row {loaded}: {error}")
+                break
+            if not batch:
+                break
+            conn.execute("BEGIN")
+            try:
+                last_id = conn.execute("SELECT coalesce(max(flight_id), 0) FROM flights").fetchone()[0]
+                conn.executemany(add_flight, batch)
+                if not allow_conflicts:
+                    new_last_id = conn.execute("SELECT max(flight_id) FROM flights").fetchone()[0]
+                    conflicts = pilot_conflicts(conn, range(last_id + 1, new_last_id + 1))
+                    if conflicts:
+                        raise ValueError(pilot_conflict_message(conflicts))
+                conn.commit()
+            except (sqlite3.Error, ValueError) as error:
+                conn.rollback()
+                print(f"Load stopped at rows {loaded + 1}-{loaded + len(batch)}: {error}")
+                break
+            loaded += len(batch)
+    finally:
+        conn.execute(f"PRAGMA synchronous = {previous_synchronous}")
+        conn.execute(f"PRAGMA cache_size = {previous_cache_size}")
+    return loaded, perf_counter() - start
+
+@instrumented
+def import_flights(conn, path, batch_size=10000, allow_conflicts=False):
+    imported, elapsed = load_flight_rows(conn, read_flight_file(path), batch_size, allow_conflicts)
+    rate = imported / elapsed if elapsed > 0 else 0
+    print(f"Imported {imported} flights from {path} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return imported
+
+#Export streams rows from the cursor to the file in chunks of chunk_size, so memory stays bounded however many rows
+#there are. "flight_details" is the joined flight view the menu prints (names resolved from the dimension cache, read
+#page by page with keyset pagination); the raw tables are read with fetchmany from a single ordered SELECT.
+#Columns are (name, type) so the Parquet/Arrow schema can be built without inspecting the data.
+flight_detail_columns = ("flight_id", "date", "time", "status", "origin_airport", "origin_city", "destination_airport",
+                         "destination_city", "pilot_id", "pilot_forename", "pilot_surname")
+destination_columns = ("destination_id", "airport", "city", "country")
+pilot_columns = ("pilot_id", "forename", "surname", "license_no", "years_of_xp", "email", "phone")
+export_integer_columns = {"flight_id", "pilot_id", "origin_id", "destination_id", "years_of_xp"}
+
+#Source -> (table to read or None for the joined view, columns)
+export_sources = {
+    "flight_details": (None, flight_detail_columns),
+    "flights":        ("flights", ("flight_id", "date", "time", "origin_id", "destination_id", "pilot_id", "status")),
+    "destinations":   ("destinations", destination_columns),
+    "pilots":         ("pilots", pilot_columns)
+}
+#File extension -> format, and compression suffix -> compression, used when they aren't given explicitly
+export_extensions = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+export_compression_suffixes = {".gz": "gzip", ".zst": "zstd"}
+
+def export_chunks(conn, source, chunk_size):
+    table, columns = export_sources[source]
+    if table is None:
+        yield from iter_flight_pages(conn, all_flight_details_query, (), 0, chunk_size)
+        return
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {columns[0]}")
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def open_export_text(path, compression):
+    if compression == "gzip":
+        import gzip
+        return gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="")
+    if compression == "zstd":
+        import io
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, "wb")), encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def write_csv_export(path, chunks, columns, compression):
+    import csv
+    count = 0
+    with open_export_text(path, compression) as export_file:
+        writer = csv.writer(export_file)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+def write_jsonl_export(path, chunks, columns, compression):
+    import json
+    count = 0
+    with open_export_text(path, compression) as export_file:
+        for rows in chunks:
+            export_file.write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows))
+            count += len(rows)
+    return count
+
+def write_arrow_export(path, chunks, columns, compression, export_format):
+    #Each chunk becomes one Parquet row group / Arrow record batch
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError(f"{export_format} export needs the pyarrow package (pip install pyarrow)")
+    schema = pyarrow.schema([(name, pyarrow.int64() if name in export_integer_columns else pyarrow.string()) for name in columns])
+    if export_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(path, schema, compression=compression or "snappy")
+    else:
+        if compression == "gzip":
+            raise ValueError("Arrow files support zstd compression only")
+        options = pyarrow.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+        writer = pyarrow.ipc.new_file(path, schema, options=options)
+    count = 0
+    try:
+        for rows in chunks:
+            arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    finally:
+        writer.close()
+    return count
+
+@instrumented
+def export_data(conn, path, source="flight_details", export_format=None, compression=None, chunk_size=50000):
+    #Writes source (flight_details, flights, destinations or pilots) to path as csv, jsonl, parquet or arrow.
+    #The format and compression default to what the file name says, e.g. flights.csv.gz or flights.parquet.
+    name, suffix = os.path.splitext(path.lower())
+    if compression is None and suffix in export_compression_suffixes:
+        compression = export_compression_suffixes[suffix]
+        name, suffix = os.path.splitext(name)
+    if export_format is None:
+        if suffix not in export_extensions:
+            raise ValueError(f"Can't tell the export format from '{path}'; use a .csv, .jsonl, .parquet or .arrow file name or give the format")
+        export_format = export_extensions[suffix]
+    if source not in export_sources:
+        raise ValueError(f"Unknown export source '{source}' (choose from {', '.join(export_sources)})")
+
+    columns = export_sources[source][1]
+    chunks = export_chunks(conn, source, chunk_size)
+    start = perf_counter()
+    if export_format == "csv":
+        count = write_csv_export(path, chunks, columns, compression)
+    elif export_format == "jsonl":
+        count = write_jsonl_export(path, chunks, columns, compression)
+    elif export_format in ("parquet", "arrow"):
+        count = write_arrow_export(path, chunks, columns, compression, export_format)
+    else:
+        raise ValueError(f"Unknown export format '{export_format}'")
+    elapsed = perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Exported {count} {source} rows to {path} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return count
+
+#Synthetic data for load testing. The same seed and sizes always produce the same rows, so benchmark runs on different
+#commits are measured against identical data. Destination popularity follows a Zipf-like curve (a few busy hubs and a
+#long tail), departure times cluster in the daytime and statuses follow the flight date relative to the middle of the range.
+synthetic_cities = [
+    ("London", "UK"), ("Manchester", "UK"), ("Edinburgh", "UK"), ("New York", "USA"), ("Los Angeles", "USA"),
+    ("Chicago", "USA"), ("Atlanta", "USA"), ("Dallas", "USA"), ("Denver", "USA"), ("Seattle", "USA"),
+    ("Miami", "USA"), ("San Francisco", "USA"), ("Toronto", "Canada"), ("Vancouver", "Canada"), ("Montreal", "Canada"),
+    ("Mexico City", "Mexico"), ("Cancun", "Mexico"), ("Sao Paulo", "Brazil"), ("Rio de Janeiro", "Brazil"),
+    ("Buenos Aires", "Argentina"), ("Santiago", "Chile"), ("Lima", "Peru"), ("Bogota", "Colombia"),
+    ("Paris", "France"), ("Nice", "France"), ("Lyon", "France"), ("Frankfurt", "Germany"), ("Munich", "Germany"),
+    ("Berlin", "Germany"), ("Amsterdam", "Netherlands"), ("Brussels", "Belgium"), ("Zurich", "Switzerland"),
+    ("Geneva", "Switzerland"), ("Vienna", "Austria"), ("Madrid", "Spain"), ("Barcelona", "Spain"), ("Lisbon", "Portugal"),
+    ("Rome", "Italy"), ("Milan", "Italy"), ("Athens", "Greece"), ("Istanbul", "Turkey"), ("Copenhagen", "Denmark"),
+    ("Stockholm", "Sweden"), ("Oslo", "Norway"), ("Helsinki", "Finland"), ("Dublin", "Ireland"), ("Warsaw", "Poland"),
+    ("Prague", "Czech Republic"), ("Dubai", "UAE"), ("Abu Dhabi", "UAE"), ("Doha", "Qatar"), ("Cairo", "Egypt"),
+    ("Johannesburg", "South Africa"), ("Cape Town", "South Africa"), ("Nairobi", "Kenya"), ("Lagos", "Nigeria"),
+    ("Delhi", "India"), ("Mumbai", "India"), ("Bangalore", "India"), ("Singapore", "Singapore"), ("Bangkok", "Thailand"),
+    ("Kuala Lumpur", "Malaysia"), ("Jakarta", "Indonesia"), ("Manila", "Philippines"), ("Hong Kong", "China"),
+    ("Beijing", "China"), ("Shanghai", "China"), ("Seoul", "South Korea"), ("Tokyo", "Japan"), ("Osaka", "Japan"),
+    ("Sydney", "Australia"), ("Melbourne", "Australia"), ("Perth", "Australia"), ("Auckland", "New Zealand")
+]
+synthetic_airport_suffixes = ["International", "Regional", "City", "Municipal", "Central", "Executive"]
+synthetic_forenames = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth", "David",
+    "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Daniel", "Nancy",
+    "Matthew", "Lisa", "Anthony", "Emily", "Mark", "Sophie", "Oliver", "Amelia", "Harry", "Isla", "Liam", "Priya",
+    "Arjun", "Yuki", "Kenji", "Mei", "Lucas", "Chloe", "Mateo", "Sofia", "Noah", "Aisha", "Omar", "Fatima"
+]
+synthetic_surnames = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez", "Wilson",
+    "Anderson", "Taylor", "Thomas", "Moore", "Jackson", "Martin", "Lee", "Thompson", "White", "Harris", "Clark",
+    "Lewis", "Walker", "Hall", "Young", "King", "Wright", "Scott", "Green", "Baker", "Adams", "Nelson", "Patel",
+    "Singh", "Kumar", "Tanaka", "Suzuki", "Chen", "Wang", "Kim", "Park", "Nguyen", "Silva", "Santos", "Muller",
+    "Schmidt", "Rossi", "Dubois", "Murphy", "O'Brien", "Kowalski", "Novak", "Hassan", "Ali", "Okafor"
+]
+synthetic_start_date = "2025-01-01"
+synthetic_days = 730
+#Departures per hour of the day, relative to each other
+synthetic_hour_weights = [1, 1, 1, 1, 2, 6, 10, 12, 12, 11, 10, 10, 10, 10, 10, 11, 12, 12, 11, 10, 8, 6, 4, 2]
+
+def synthetic_destinations(rng, count):
+    #(airport, city, country) rows: each city gets one airport per suffix, numbered fields once every pairing is used
+    rows = []
+    pairs = [(city, country, suffix) for suffix in synthetic_airport_suffixes for city, country in synthetic_cities]
+    for index in range(count):
+        city, country, suffix = pairs[index % len(pairs)]
+        field_number = index // len(pairs)
+        airport = f"{city} {suffix}" if field_number == 0 else f"{city} {suffix} Field {field_number + 1}"
+        rows.append((airport, city, country))
+    rng.shuffle(rows)
+    return rows
+
+def synthetic_pilots(rng, count):
+    #(forename, surname, license_no, years_of_xp, email, phone) rows with unique licence numbers and emails
+    rows = []
+    for index in range(count):
+        forename = rng.choice(synthetic_forenames)
+        surname = rng.choice(synthetic_surnames)
+        email_name = f"{forename}.{surname}".lower().replace("'", "")
+        rows.append((
+            forename,
+            surname,
+            f"LIC{index + 10000:06d}",
+            rng.randint(1, 35),
+            f"{email_name}{index + 1}@example.com",
+            f"555-{rng.randint(0, 9999):04d}"
+        ))
+    return rows
+
+def synthetic_status(rng, day, today):
+    #Flights before "today" have mostly arrived, flights on the day are in progress and later flights are scheduled
+    roll = rng.random()
+    if day < today:
+        return "Cancelled" if roll < 0.04 else "Arrived"
+    if day == today:
+        return "Boarding" if roll < 0.3 else "Departed" if roll < 0.8 else "Scheduled"
+    return "Cancelled" if roll < 0.02 else "Scheduled"
+
+def synthetic_flights(rng, count, destination_ids, pilot_ids):
+    #Generator of (date, time, origin_id, destination_id, pilot_id, status) tuples in departure order
+    popularity = [1 / (rank + 1) ** 0.8 for rank in range(len(destination_ids))]
+    cumulative_popularity = list(itertools.accumulate(popularity))
+    cumulative_hours = list(itertools.accumulate(synthetic_hour_weights))
+    start = datetime.date.fromisoformat(synthetic_start_date)
+    dates = [(start + datetime.timedelta(days=day)).isoformat() for day in range(synthetic_days)]
+    today = synthetic_days // 2
+
+    for index in range(count):
+        day = index * synthetic_days // count
+        hour = rng.choices(range(24), cum_weights=cumulative_hours)[0]
+        origin_id, destination_id = rng.choices(destination_ids, cum_weights=cumulative_popularity, k=2)
+        if origin_id == destination_id and len(destination_ids) > 1:
+            destination_id = destination_ids[(destination_ids.index(destination_id) + 1) % len(destination_ids)]
+        yield (
+            dates[day],
+            f"{hour:02d}:{rng.randrange(0, 60, 5):02d}",
+            origin_id,
+            destination_id,
+            rng.choice(pilot_ids),
+            synthetic_status(rng, day, today)
+        )
+
+@instrumented
+def generate_sample_data(conn, flights, random_seed=42, destinations=None, pilots=None, batch_size=10000):
+    #Fills an empty database with synthetic data. Destination and pilot counts default to values that scale with the
+    #number of flights (50-1000 destinations, 50-20000 pilots).
+    for table in ("destinations", "pilots", "flights"):
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            raise ValueError(f"Refusing to generate data: the {table} table already contains data.")
+    if destinations is None:
+        destinations = min(1000, max(50, flights // 10000))
+    if pilots is None:
+        pilots = min(20000, max(50, flights // 500))
+    if destinations < 2 or pilots < 1:
+        raise ValueError("At least 2 destinations and 1 pilot are needed to generate flights.")
+
+    import random
+    rng = random.Random(random_seed)
+    conn.execute("BEGIN")
+    try:
+        conn.executemany("INSERT INTO destinations (airport, city, country) VALUES (?, ?, ?)",
+                         synthetic_destinations(rng, destinations))
+        conn.executemany("""
+        INSERT INTO pilots (forename, surname, license_no, years_of_xp, email, phone)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, synthetic_pilots(rng, pilots))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    invalidate_dimension_cache(conn)
+
+    destination_ids = [row[0] for row in conn.execute("SELECT destination_id FROM destinations ORDER BY destination_id")]
+    pilot_ids = [row[0] for row in conn.execute("SELECT pilot_id FROM pilots ORDER BY pilot_id")]
+    #Pilots are picked at random, so synthetic schedules are expected to contain double-bookings
+    loaded, elapsed = load_flight_rows(conn, synthetic_flights(rng, flights, destination_ids, pilot_ids), batch_size,
+                                       allow_conflicts=True)
+    rate = loaded / elapsed if elapsed > 0 else 0
+    print(f"Generated {destinations} destinations, {pilots} pilots and {loaded} flights "
+          f"(seed {random_seed}) in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return loaded
+
+@instrumented
+def update_flight_date(conn, flight_id, new_date, allow_conflicts=False):
     update_flight_date_query = """
     UPDATE flights
     SET date = ?
     WHERE flight_id = ?
     """
     cursor = conn.execute(update_flight_date_query, (new_date, flight_id))
-    conn.commit()
+    check_pilot_conflicts(conn, [flight_id], allow_conflicts)
+    commit_write(conn)
     print()
     print(f"Flight {flight_id} date updated to {new_date}")
+    return cursor.rowcount
 
-def update_flight_time(conn, flight_id, new_time):
+@instrumented
+def update_flight_time(conn, flight_id, new_time, allow_conflicts=False):
     update_flight_time_query = """
     UPDATE flights
     SET time = ?
     WHERE flight_id = ?
     """
     cursor = conn.execute(update_flight_time_query, (new_time, flight_id))
-    conn.commit()
+    check_pilot_conflicts(conn, [flight_id], allow_conflicts)
+    commit_write(conn)
     print()
     print(f"Flight {flight_id} time updated to {new_time}")
+    return cursor.rowcount
 
-def update_flight_status(conn, flight_id, new_status):
+@instrumented
+def update_flight_status(conn, flight_id, new_status, allow_conflicts=False):
     update_flight_status_query = """
     UPDATE flights
     SET status = ?
     WHERE flight_id = ?
     """
     cursor = conn.execute(update_flight_status_query, (new_status, flight_id))
-    conn.commit()
+    check_pilot_conflicts(conn, [flight_id], allow_conflicts)
+    commit_write(conn)
     print()
     print(f"Flight {flight_id} status updated to {new_status}")
+    return cursor.rowcount
 
-def assign_pilot_to_flight(conn, flight_id, pilot_id):
+@instrumented
+def assign_pilot_to_flight(conn, flight_id, pilot_id, allow_conflicts=False):
     assign_pilot_to_flight_query = """
     UPDATE flights
     SET pilot_id = ?
     WHERE flight_id = ?
     """
     cursor = conn.execute(assign_pilot_to_flight_query, (pilot_id, flight_id))
-    conn.commit()
+    check_pilot_conflicts(conn, [flight_id], allow_conflicts)
+    commit_write(conn)
     print()
     print(f"Pilot {pilot_id} assigned to flight {flight_id}")
+    return cursor.rowcount
 
+@instrumented
 def delete_flight_record(conn, flight_id):
     delete_flight_query = """
     DELETE FROM flights
     WHERE flight_id = ?
     """
     cursor = conn.execute(delete_flight_query, (flight_id,))
-    conn.commit()
+    commit_write(conn)
     print()
     print(f"Flight {flight_id} deleted")
+    return cursor.rowcount
 
+@instrumented
 def add_destination(conn, airport, city, country):
     add_destination_query = """
     INSERT INTO destinations (airport, city, country)
     VALUES (?, ?, ?)
     """
     cursor = conn.execute(add_destination_query, (airport, city, country))
-    conn.commit()
+    commit_write(conn)
+    invalidate_dimension_cache(conn)
     print()
     print(f"New destination: {airport} - {city} - {country} added to database\n")
+    return cursor.lastrowid
 
+@instrumented
 def delete_destination(conn, airport):
     delete_destination_query = """
     DELETE FROM destinations
     WHERE airport = ?
     """
     cursor = conn.execute(delete_destination_query, (airport,))
-    conn.commit()
+    commit_write(conn)
+    invalidate_dimension_cache(conn)
     print()
     print(f"Airport: {airport} deleted from database\n")
+    return cursor.rowcount
 
+@instrumented
 def update_flight_destination(conn, flight_id, new_destination_id):
     update_flight_destination_query = """
     UPDATE flights
@@ -373,16 +2169,80 @@ def update_flight_destination(conn, flight_id, new_destination_id):
     WHERE flight_id = ?
     """
     cursor = conn.execute(update_flight_destination_query, (new_destination_id, flight_id))
-    conn.commit()
+    commit_write(conn)
     print()
     print(f"Flight {flight_id} destination updated to {new_destination_id}")
+    return cursor.rowcount
+
+#Batch versions of the single-flight updates above, for disruption handling where hundreds of flights change at once.
+#Each one accepts either a list of flight ids plus a single new value, e.g. update_flight_status_batch(conn, [3, 4, 5], "Cancelled"),
+#or a list of (flight_id, new_value) pairs, and applies everything with one executemany inside one transaction (one fsync).
+#They return the number of flights updated and the list of requested flight ids that don't exist.
+#If any row fails (e.g. a pilot_id/destination_id foreign key) the whole batch is rolled back and the error re-raised, and
+#so is a date, time, status or pilot change that double-books a pilot (ValueError, see check_pilot_conflicts).
+batch_lookup_size = 500
+
+def existing_flight_ids(conn, flight_ids):
+    #Returns the subset of flight_ids present in the flights table, looked up in chunks of bound parameters
+    found = set()
+    flight_ids = list(flight_ids)
+    for start in range(0, len(flight_ids), batch_lookup_size):
+        chunk = flight_ids[start:start + batch_lookup_size]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor = conn.execute(f"SELECT flight_id FROM flights WHERE flight_id IN ({placeholders})", chunk)
+        found.update(row[0] for row in cursor)
+    return found
+
+def batch_update_flights(conn, column, updates, new_value=None, allow_conflicts=False):
+    if new_value is not None:
+        updates = [(flight_id, new_value) for flight_id in updates]
+    else:
+        updates = list(updates)
+
+    begin_write(conn, "IMMEDIATE")
+    try:
+        found = existing_flight_ids(conn, (flight_id for flight_id, _ in updates))
+        missing_ids = sorted({flight_id for flight_id, _ in updates if flight_id not in found})
+        cursor = conn.executemany(
+            f"UPDATE flights SET {column} = ? WHERE flight_id = ?",
+            [(value, flight_id) for flight_id, value in updates if flight_id in found]
+        )
+        if column in pilot_conflict_columns:
+            check_pilot_conflicts(conn, sorted(found), allow_conflicts)
+        commit_write(conn)
+    except sqlite3.Error:
+        rollback_write(conn)
+        raise
 
+    print()
+    print(f"{cursor.rowcount} flight {column} values updated")
+    if missing_ids:
+        print(f"Flight IDs not found: {', '.join(str(flight_id) for flight_id in missing_ids)}")
+    return cursor.rowcount, missing_ids
+
+@instrumented
+def update_flight_date_batch(conn, updates, new_date=None, allow_conflicts=False):
+    return batch_update_flights(conn, "date", updates, new_date, allow_conflicts)
+
+@instrumented
+def update_flight_time_batch(conn, updates, new_time=None, allow_conflicts=False):
+    return batch_update_flights(conn, "time", updates, new_time, allow_conflicts)
+
+@instrumented
+def update_flight_status_batch(conn, updates, new_status=None, allow_conflicts=False):
+    return batch_update_flights(conn, "status", updates, new_status, allow_conflicts)
+
+@instrumented
+def assign_pilot_to_flight_batch(conn, updates, pilot_id=None, allow_conflicts=False):
+    return batch_update_flights(conn, "pilot_id", updates, pilot_id, allow_conflicts)
+
+@instrumented
+def update_flight_destination_batch(conn, updates, new_destination_id=None):
+    return batch_update_flights(conn, "destination_id", updates, new_destination_id)
+
+@instrumented
 def view_all_destinations(conn):
-    view_all_destinations_query = """
-    SELECT * FROM destinations
-    """
-    cursor = conn.execute(view_all_destinations_query)
-    rows = cursor.fetchall()
+    rows = [(destination_id, *details) for destination_id, details in dimension_cache(conn)["destinations"].items()]
     print("\n -- All Destinations: -- \n")
     for row in rows:
         destination_id, airport, city, country = row
@@ -392,28 +2252,33 @@ def view_all_destinations(conn):
         print(f"country: {country}")
         print("\n---\n")
 
+filter_by_pilot_query = """
+SELECT
+    f.flight_id,
+    f.date,
+    f.time,
+    f.status,
+    f.origin_id,
+    f.destination_id,
+    f.pilot_id
+FROM flights f
+WHERE f.pilot_id = ?
+"""
+
+def filter_by_pilot_rows(conn, pilot_id):
+    #(pilot_id, forename, surname, flight_id, date, time, status, origin_airport, origin_city, destination_airport,
+    #destination_city) for each of the pilot's flights, or one row with empty flight details if they have none
+    pilot = dimension_cache(conn)["pilots"].get(pilot_id)
+    if pilot is None:
+        return []
+    flights = resolve_flight_rows(conn, conn.execute(filter_by_pilot_query, (pilot_id,)).fetchall())
+    if not flights:
+        return [(pilot_id, pilot[0], pilot[1]) + (None,) * 8]
+    return [(pilot_id, pilot[0], pilot[1], *flight[:8]) for flight in flights]
+
+@instrumented
 def filter_by_pilot(conn, pilot_id):
-    filter_by_pilot_query = """
-    SELECT
-        p.pilot_id AS pilot_id,
-        p.forename AS pilot_forename,
-        p.surname AS pilot_surname,
-        f.flight_id,
-        f.date,
-        f.time,
-        f.status,
-        o.airport AS origin_airport,
-        o.city AS origin_city,
-        d.airport AS destination_airport,
-        d.city AS destination_city
-    FROM pilots p
-    LEFT JOIN flights f ON f.pilot_id = p.pilot_id
-    LEFT JOIN destinations o ON f.origin_id = o.destination_id
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    WHERE p.pilot_id = ?
-    """
-    cursor = conn.execute(filter_by_pilot_query, (pilot_id,))
-    rows = cursor.fetchall()
+    rows = filter_by_pilot_rows(conn, pilot_id)
     print("\nFlights for Pilot:\n")
     for row in rows:
         pilot_id, pilot_forename, pilot_surname, flight_id, date, time, status, origin_airport, origin_city, destination_airport, destination_city = row
@@ -431,12 +2296,9 @@ def filter_by_pilot(conn, pilot_id):
         print(f"destination_city:    {destination_city}")
         print("\n---\n")
 
+@instrumented
 def view_all_pilots(conn):
-    view_all_pilots_query = """
-    SELECT * FROM pilots
-    """
-    cursor = conn.execute(view_all_pilots_query)
-    rows = cursor.fetchall()
+    rows = [(pilot_id, *details) for pilot_id, details in dimension_cache(conn)["pilots"].items()]
     print("\n -- All Pilots: -- \n")
     for row in rows:
         pilot_id, pilot_forename, pilot_surname, license_no, years_of_xp, email, phone = row
@@ -449,42 +2311,50 @@ def view_all_pilots(conn):
         print(f"phone:               {phone}")
         print("\n---\n")
 
+#The workload and popularity reports read the trigger-maintained counter tables from migration 6 instead of grouping
+#the flights table. Counters can drop to 0 when flights move or are deleted, which the reports treat as no flights.
+count_flights_by_pilot_query = """
+SELECT p.pilot_id, p.forename, p.surname, c.total_flights
+FROM pilot_flight_counts c
+JOIN pilots p ON p.pilot_id = c.pilot_id
+WHERE c.total_flights > 0
+ORDER BY c.total_flights DESC;
+"""
+
+@instrumented
 def count_flights_by_pilot(conn):
-    pilot_flight_count = """
-    SELECT p.pilot_id, p.forename, p.surname, COUNT(*) AS total_flights
-    FROM flights f
-    LEFT JOIN pilots p ON f.pilot_id = p.pilot_id
-    GROUP BY p.pilot_id
-    ORDER BY total_flights DESC;
-    """
-    cursor = conn.execute(pilot_flight_count)
+    cursor = conn.execute(count_flights_by_pilot_query)
     rows = cursor.fetchall()
     print("\nFormat: pilot_id, pilot_forename, pilot_surname, count_of_assigned_flights")
     for row in rows:
         print(row)
 
+most_experienced_pilots_query = """
+SELECT forename, surname, years_of_xp
+FROM pilots
+ORDER BY years_of_xp DESC
+LIMIT 3;
+"""
+
+@instrumented
 def most_experienced_pilots(conn):
-    most_experienced_pilots = """
-    SELECT forename, surname, years_of_xp
-    FROM pilots
-    ORDER BY years_of_xp DESC
-    LIMIT 3
-    """
-    cursor = conn.execute(most_experienced_pilots)
+    cursor = conn.execute(most_experienced_pilots_query)
     rows = cursor.fetchall()
     print("\nFormat: forename, surname, years_of_xp")
     for row in rows:
         print(row)
     print()
 
+least_experienced_pilots_query = """
+SELECT forename, surname, years_of_xp
+FROM pilots
+ORDER BY years_of_xp ASC
+LIMIT 3;
+"""
+
+@instrumented
 def least_experienced_pilots(conn):
-    least_experienced_pilots = """
-    SELECT forename, surname, years_of_xp
-    FROM pilots
-    ORDER BY years_of_xp ASC
-    LIMIT 3
-    """
-    cursor = conn.execute(least_experienced_pilots)
+    cursor = conn.execute(least_experienced_pilots_query)
     rows = cursor.fetchall()
     print("\nFormat: forename, surname, years_of_xp")
     for row in rows:
@@ -492,220 +2362,1881 @@ def least_experienced_pilots(conn):
     print()
     
 
+most_popular_destinations_query = """
+SELECT d.country, d.airport, d.city, c.total_flights
+FROM destination_flight_counts c
+JOIN destinations d ON d.destination_id = c.destination_id
+WHERE c.total_flights > 0
+ORDER BY c.total_flights DESC
+LIMIT 3;
+"""
+
+@instrumented
 def most_popular_destinations(conn):
-    most_popular_destination_query = """
-    SELECT d.country, d.airport, d.city, COUNT(*) AS total_flights
-    FROM flights f
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    GROUP BY d.country, d.airport, d.city
-    ORDER BY total_flights DESC
-    LIMIT 3;
-    """
-    cursor = conn.execute(most_popular_destination_query)
+    cursor = conn.execute(most_popular_destinations_query)
     rows = cursor.fetchall()
     print("\nFormat: country, airport, city, count_of_flights")
     for row in rows:
         print(row)
 
+least_popular_destinations_query = """
+SELECT d.country, d.airport, d.city, c.total_flights
+FROM destination_flight_counts c
+JOIN destinations d ON d.destination_id = c.destination_id
+WHERE c.total_flights > 0
+ORDER BY c.total_flights ASC
+LIMIT 3;
+"""
+
+@instrumented
 def least_popular_destinations(conn):
-    least_popular_destination_query = """
-    SELECT d.country, d.airport, d.city, COUNT(*) AS total_flights
-    FROM flights f
-    LEFT JOIN destinations d ON f.destination_id = d.destination_id
-    GROUP BY d.country, d.airport, d.city
-    ORDER BY total_flights ASC
-    LIMIT 3;
-    """
-    cursor = conn.execute(least_popular_destination_query)
+    cursor = conn.execute(least_popular_destinations_query)
     rows = cursor.fetchall()
     print("\nFormat: country, airport, city, count_of_flights")
     for row in rows:
         print(row)
     
 
-while True:
-    print(" \n --- Welcome to the Flight Information Tool --- \n")
-    print("Select an option from the menu below: \n")
-    print("1) View All Flight Information - Enter '1'")
-    print("2) View Flight Information by Specific Criteria - Enter '2'")
-    print("3) Add a New Flight - Enter '3'")
-    print("4) Update Flight Information (Including Pilot Assignment) - Enter '4'")
-    print("5) Update Destination Information - Enter '5'")
-    print("6) View Pilot Information & Schedule - Enter '6'")
-    print("7) View Most and Least Popular Destinations - Enter '7'")
-    print("8) Exit - Enter '8'")
-    print()
-    selection = input("Select an option: \n")
-    
-    if selection == '1':
-        all_flight_details(conn)
+count_flights_by_status_query = """
+SELECT status, total_flights
+FROM status_flight_counts
+WHERE total_flights > 0
+ORDER BY status;
+"""
+
+@instrumented
+def count_flights_by_status(conn):
+    cursor = conn.execute(count_flights_by_status_query)
+    rows = cursor.fetchall()
+    print("\nFormat: status, count_of_flights")
+    for row in rows:
+        print(row)
+
+#Counter table -> the flights column it counts
+flight_count_tables = {
+    "pilot_flight_counts":       "pilot_id",
+    "destination_flight_counts": "destination_id",
+    "status_flight_counts":      "status"
+}
+
+@instrumented
+def rebuild_flight_counts(conn):
+    #Recomputes every counter from the flights table in one transaction, e.g. after restoring a backup taken without triggers
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table, column in flight_count_tables.items():
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table}({column}, total_flights) SELECT {column}, COUNT(*) FROM flights GROUP BY {column}")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    print("Flight counters rebuilt")
+
+@instrumented
+def verify_flight_counts(conn):
+    #Compares every counter with a fresh GROUP BY over flights and returns [(table, key, stored, actual), ...] for any that differ
+    mismatches = []
+    for table, column in flight_count_tables.items():
+        actual = dict(conn.execute(f"SELECT {column}, COUNT(*) FROM flights GROUP BY {column}"))
+        stored = dict(conn.execute(f"SELECT {column}, total_flights FROM {table} WHERE total_flights != 0"))
+        for key in actual.keys() | stored.keys():
+            if actual.get(key, 0) != stored.get(key, 0):
+                mismatches.append((table, key, stored.get(key, 0), actual.get(key, 0)))
+    return mismatches
+
+#Change data capture. Triggers (migration 10) append one change_log row per inserted, updated or deleted flight, pilot
+#or destination, so a downstream copy stays in sync by reading the changes after the last seq it has seen - a primary
+#key range, costing O(changes) instead of re-reading the tables.
+#Named consumers keep a checkpoint in change_consumers. register_change_consumer starts one at the end of the log (after
+#taking its own snapshot of the tables) or at the oldest change still kept, and iter_consumer_changes hands out batches,
+#checkpointing each batch when the next one is asked for: a consumer that stops part way through is given the unfinished
+#batch again next time (at-least-once delivery).
+#compact_change_log deletes the changes every registered consumer has read, so remove consumers that are gone for good
+#or they hold the log back. Readers without a checkpoint, like the in-process analytics engine and route graph, remember
+#the seq they are up to and reload everything if compaction has overtaken it.
+change_log_columns = ("seq", "table_name", "row_id", "operation", "changed_columns")
+change_log_tables = ("flights", "pilots", "destinations")
+
+def change_log_position(conn):
+    #The highest seq written so far, including changes that have since been compacted
+    return conn.execute("""
+    SELECT max(coalesce((SELECT max(seq) FROM change_log), 0), compacted_through)
+    FROM change_log_compaction
+    """).fetchone()[0]
+
+def change_log_compacted_through(conn):
+    return conn.execute("SELECT compacted_through FROM change_log_compaction").fetchone()[0]
+
+def changes_after(conn, after_seq=None, limit=1000, tables=None):
+    #[(seq, table_name, row_id, operation, changed_columns), ...] in seq order, optionally only for some tables.
+    #Without after_seq it starts at the oldest change still kept; an after_seq that has been compacted past is an error.
+    compacted_through = change_log_compacted_through(conn)
+    if after_seq is None:
+        after_seq = compacted_through
+    elif after_seq < compacted_through:
+        raise ValueError(f"Changes up to seq {compacted_through} have been compacted, so changes after {after_seq} are no longer "
+                         f"complete. Re-read the tables and continue from seq {change_log_position(conn)}.")
+    sql = "SELECT seq, table_name, row_id, operation, changed_columns FROM change_log WHERE seq > ?"
+    params = [after_seq]
+    if tables:
+        sql += f" AND table_name IN ({', '.join('?' * len(tables))})"
+        params.extend(tables)
+    return conn.execute(sql + " ORDER BY seq LIMIT ?", (*params, limit)).fetchall()
+
+def flight_changes_since(conn, after_seq):
+    #(current log position, set of flight ids inserted, updated or deleted after after_seq), or None if the log has been
+    #compacted past after_seq. Call it inside the transaction that re-reads those flights so the two agree.
+    if after_seq < change_log_compacted_through(conn):
+        return None
+    flight_ids = {row[0] for row in conn.execute(
+        "SELECT row_id FROM change_log WHERE seq > ? AND table_name = 'flights'", (after_seq,))}
+    return change_log_position(conn), flight_ids
+
+def change_consumer_checkpoint(conn, name):
+    row = conn.execute("SELECT last_seq FROM change_consumers WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        raise ValueError(f"No change consumer called '{name}'")
+    return row[0]
+
+@instrumented
+def register_change_consumer(conn, name, from_start=False):
+    #Returns the consumer's checkpoint; registering a name that already exists leaves its checkpoint alone
+    begin_write(conn, "IMMEDIATE")
+    try:
+        start = change_log_compacted_through(conn) if from_start else change_log_position(conn)
+        conn.execute("INSERT OR IGNORE INTO change_consumers (name, last_seq) VALUES (?, ?)", (name, start))
+        commit_write(conn)
+    except sqlite3.Error:
+        rollback_write(conn)
+        raise
+    checkpoint = change_consumer_checkpoint(conn, name)
+    print(f"Change consumer {name} reads changes after seq {checkpoint}")
+    return checkpoint
+
+@instrumented
+def checkpoint_change_consumer(conn, name, seq):
+    #Checkpoints never move backwards
+    cursor = conn.execute("UPDATE change_consumers SET last_seq = max(last_seq, ?) WHERE name = ?", (seq, name))
+    commit_write(conn)
+    if not cursor.rowcount:
+        raise ValueError(f"No change consumer called '{name}'")
+    return cursor.rowcount
+
+@instrumented
+def remove_change_consumer(conn, name):
+    cursor = conn.execute("DELETE FROM change_consumers WHERE name = ?", (name,))
+    commit_write(conn)
+    print(f"Change consumer {name} {'removed' if cursor.rowcount else 'not found'}")
+    return cursor.rowcount
+
+def iter_consumer_changes(conn, name, batch_size=1000):
+    #Yields the consumer's unread changes batch by batch, checkpointing a batch when the next one is requested.
+    #There is no table filter: a checkpoint covers every seq up to it, so it may only pass changes that were delivered.
+    #Consumers interested in some tables skip the other rows themselves.
+    while True:
+        batch = changes_after(conn, change_consumer_checkpoint(conn, name), batch_size)
+        if not batch:
+            return
+        yield batch
+        checkpoint_change_consumer(conn, name, batch[-1][0])
+
+@instrumented
+def compact_change_log(conn):
+    #Deletes the changes that every registered consumer has read (all of them if there are no consumers)
+    begin_write(conn, "IMMEDIATE")
+    try:
+        through = conn.execute("SELECT min(last_seq) FROM change_consumers").fetchone()[0]
+        if through is None:
+            through = change_log_position(conn)
+        cursor = conn.execute("DELETE FROM change_log WHERE seq <= ?", (through,))
+        conn.execute("UPDATE change_log_compaction SET compacted_through = max(compacted_through, ?)", (through,))
+        commit_write(conn)
+    except sqlite3.Error:
+        rollback_write(conn)
+        raise
+    print(f"Compacted {cursor.rowcount} changes up to seq {through}")
+    return cursor.rowcount
+
+def print_changes(rows):
+    for row in rows:
+        print(row)
+
+@instrumented
+def list_changes(conn, after_seq=None, limit=100, tables=None):
+    rows = changes_after(conn, after_seq, limit, tables)
+    print("\nFormat: " + ", ".join(change_log_columns))
+    print_changes(rows)
+    return rows
+
+@instrumented
+def consume_changes(conn, name, batch_size=1000):
+    #Prints and checkpoints everything the consumer hasn't read yet, returning the number of changes
+    print("\nFormat: " + ", ".join(change_log_columns))
+    consumed = 0
+    for batch in iter_consumer_changes(conn, name, batch_size):
+        print_changes(batch)
+        consumed += len(batch)
+    print(f"\n{consumed} changes consumed by {name}, now at seq {change_consumer_checkpoint(conn, name)}")
+    return consumed
+
+@instrumented
+def view_change_consumers(conn):
+    position = change_log_position(conn)
+    rows = conn.execute("SELECT name, last_seq FROM change_consumers ORDER BY name").fetchall()
+    print(f"\nChange log at seq {position}, compacted through seq {change_log_compacted_through(conn)}")
+    print("Format: consumer, last_seq, unread_changes")
+    for name, last_seq in rows:
+        print((name, last_seq, position - last_seq))
+    return rows
+
+
+#Queries that must be answered through an index rather than a full table scan
+indexed_queries = {
+    "all_flight_details":         all_flight_details_query,
+    "flights_by_airport":         flights_by_airport_query,
+    "flights_by_airport_prefix":  flights_by_airport_prefix_query,
+    "flights_by_city":            flights_by_city_query,
+    "flights_by_city_prefix":     flights_by_city_prefix_query,
+    "flights_by_status":          flights_by_status_query,
+    "flights_filtered_by_date":   flights_filtered_by_date_query,
+    "flights_departing_between":  flights_departing_between_query,
+    "filter_by_pilot":            filter_by_pilot_query,
+    "count_flights_by_pilot":     count_flights_by_pilot_query,
+    "most_popular_destinations":  most_popular_destinations_query,
+    "least_popular_destinations": least_popular_destinations_query
+}
+
+def check_query_plans(conn):
+    #Runs EXPLAIN QUERY PLAN on each indexed query and returns any step that scans a whole table.
+    #Scanning a covering index (e.g. for GROUP BY reports) is allowed as it never touches the table rows.
+    full_scans = []
+    for function_name, query in indexed_queries.items():
+        params = (None,) * query.count("?")
+        for _, _, _, detail in conn.execute("EXPLAIN QUERY PLAN " + query, params):
+            if detail.startswith("SCAN") and "COVERING INDEX" not in detail:
+                full_scans.append((function_name, detail))
+    return full_scans
+
+#Analytics engine (python main.py analytics ..., or option 4 of the popularity sub-menu). The flights table is read once
+#into NumPy arrays - int32 ids, an int8 status code and the departure in minutes - and ad-hoc questions such as flights per
+#day per route, cancellation ratios per origin or an hourly departure histogram are answered from those arrays with
+#vectorised operations, instead of a hand-written GROUP BY and a full scan per question. numpy is optional and only
+#imported here.
+#refresh() re-reads only the flights the change log (migration 10) shows were inserted, updated or deleted since the
+#last refresh, and patches the arrays in place (they are kept in flight_id order so each flight is found with a binary
+#search). A full reload is only needed if the log was compacted past the engine's position or most flights changed.
+analytics_fetch_size = 100000
+analytics_keys = ["origin", "destination", "route", "pilot", "status", "day", "hour", "weekday", "month"]
+analytics_time_keys = {"day", "hour", "weekday", "month"}
+analytics_weekdays = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+analytics_flights_query = """
+SELECT flight_id, origin_id, destination_id, pilot_id, status, departure
+FROM flights
+"""
 
-    elif selection == '2':
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError("analytics needs the numpy package (pip install numpy)")
+    return numpy
+
+class FlightAnalytics:
+    def __init__(self, conn):
+        self.numpy = import_numpy()
+        self.conn_ref = connection_reference(conn)
+        self.status_names = list(flight_statuses)
+        self.columns = None
+        self.refresh(full=True)
+
+    @property
+    def conn(self):
+        #Held weakly: analytics_engines is keyed by the connection, and a strong reference back would keep it alive
+        return self.conn_ref()
+
+    def status_codes(self, statuses):
+        #Maps an array of status names to int8 codes, giving any status not seen before the next free code
+        numpy = self.numpy
+        names, inverse = numpy.unique(numpy.array(statuses, dtype=object).astype(str), return_inverse=True)
+        for name in names.tolist():
+            if name not in self.status_names:
+                self.status_names.append(name)
+        lookup = numpy.array([self.status_names.index(name) for name in names.tolist()], dtype=numpy.int8)
+        return lookup[inverse]
+
+    def departure_minutes(self, departures):
+        #"YYYY-MM-DD HH:MM" strings as datetime64[m]; a badly formed date or time becomes NaT rather than failing the load
+        numpy = self.numpy
+        try:
+            return numpy.array(departures, dtype="datetime64[m]")
+        except ValueError:
+            parsed = []
+            for departure in departures:
+                try:
+                    parsed.append(numpy.datetime64(departure, "m"))
+                except ValueError:
+                    parsed.append(numpy.datetime64("NaT", "m"))
+            return numpy.array(parsed, dtype="datetime64[m]")
+
+    def fetch_columns(self, where="", params=()):
+        numpy = self.numpy
+        cursor = self.conn.execute(analytics_flights_query + where + " ORDER BY flight_id", params)
+        chunks = []
         while True:
-            print("\nPlease select a criteria by entering the corresponding number\n")
-            print("1) Filter Flights by Destination Airport - Enter '1'")
-            print("2) Filter Flights by Destination City - Enter '2'")
-            print("3) Filter Flights by Status - Enter '3'")
-            print("4) Filter Flights by Date - Enter '4'")
-            print("5) Return to main menu - Enter '5'")
-            print()
-            criteria_selection = input("Select a criteria:\n")
-            if criteria_selection == '1':
-                airport = input("\nEnter the airport name (case sensitive):\n")
-                flights_by_airport(conn, airport)
-            elif criteria_selection == '2':
-                city = input("\nEnter the city name (case sensitive):\n")
-                flights_by_city(conn, city)
-            elif criteria_selection == '3':
-                status = input("\nEnter the flight status ('Arrived', 'Cancelled', 'Departed', 'Boarding', 'Scheduled'):\n")
-                flights_by_status(conn, status)
-            elif criteria_selection == '4':
-                date = input("\nEnter the date (YYYY-MM-DD):\n")
-                flights_filtered_by_date(conn, date)
-            elif criteria_selection == '5':
-                print("\nReturning to main menu\n")
+            rows = cursor.fetchmany(analytics_fetch_size)
+            if not rows:
                 break
+            flight_ids, origin_ids, destination_ids, pilot_ids, statuses, departures = zip(*rows)
+            chunks.append({
+                "flight_id": numpy.array(flight_ids, dtype=numpy.int64),
+                "origin": numpy.array(origin_ids, dtype=numpy.int32),
+                "destination": numpy.array(destination_ids, dtype=numpy.int32),
+                "pilot": numpy.array(pilot_ids, dtype=numpy.int32),
+                "status": self.status_codes(statuses),
+                "departure": self.departure_minutes(departures)
+            })
+        return chunks
+
+    def concatenate_columns(self, chunks):
+        numpy = self.numpy
+        if not chunks:
+            chunks = [{
+                "flight_id": numpy.empty(0, numpy.int64), "origin": numpy.empty(0, numpy.int32),
+                "destination": numpy.empty(0, numpy.int32), "pilot": numpy.empty(0, numpy.int32),
+                "status": numpy.empty(0, numpy.int8), "departure": numpy.empty(0, "datetime64[m]")
+            }]
+        return {name: numpy.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+    def apply_changes(self, flight_ids):
+        #Re-reads the given flights and overwrites, deletes or appends them in the arrays; returns the rows read
+        numpy = self.numpy
+        flight_ids = sorted(flight_ids)
+        chunks = []
+        for start in range(0, len(flight_ids), batch_lookup_size):
+            chunk = flight_ids[start:start + batch_lookup_size]
+            chunks.extend(self.fetch_columns(f"WHERE flight_id IN ({', '.join('?' * len(chunk))})", chunk))
+        rows = self.concatenate_columns(chunks)
+        columns = self.columns
+        loaded_ids = columns["flight_id"]
+
+        positions = numpy.searchsorted(loaded_ids, rows["flight_id"])
+        found = positions < len(loaded_ids)
+        found[found] = loaded_ids[positions[found]] == rows["flight_id"][found]
+        for name in columns:
+            columns[name][positions[found]] = rows[name][found]
+
+        deleted = numpy.setdiff1d(numpy.array(flight_ids, dtype=numpy.int64), rows["flight_id"])
+        if len(deleted):
+            keep = ~numpy.isin(loaded_ids, deleted)
+            columns = {name: values[keep] for name, values in columns.items()}
+        if not found.all():
+            added = {name: values[~found] for name, values in rows.items()}
+            in_order = not len(columns["flight_id"]) or added["flight_id"][0] > columns["flight_id"][-1]
+            columns = self.concatenate_columns([columns, added])
+            if not in_order:
+                order = numpy.argsort(columns["flight_id"], kind="stable")
+                columns = {name: values[order] for name, values in columns.items()}
+        self.columns = columns
+        return len(rows["flight_id"])
+
+    def refresh(self, full=False):
+        #Brings the arrays up to date and returns how many flights were read. The change log and the flights are read in
+        #one transaction so they agree with each other.
+        own_transaction = not self.conn.in_transaction
+        if own_transaction:
+            self.conn.execute("BEGIN")
+        try:
+            changes = None if full or self.columns is None else flight_changes_since(self.conn, self.change_seq)
+            if changes is None or len(changes[1]) > max(len(self.columns["flight_id"]) // 2, analytics_fetch_size):
+                self.change_seq = change_log_position(self.conn)
+                self.columns = self.concatenate_columns(self.fetch_columns())
+                loaded = len(self.columns["flight_id"])
             else:
-                print("\nInvalid input. Please try again.\n")
+                self.change_seq, flight_ids = changes
+                loaded = self.apply_changes(flight_ids)
+        finally:
+            if own_transaction:
+                self.conn.commit()
+        return loaded
 
-    
-    elif selection == '3':
-        print("\n Enter the following information to add a new flight record: \n")
-        date = input("Date (YYYY-MM-DD): ")
-        time = input("Time - 24hr Clock Format (HH:MM): ")
-        origin_id = int(input("Origin ID: "))
-        destination_id = int(input("Destination ID: "))
-        pilot_id = int(input("Pilot ID: "))
-        status = input("Status (Arrived, Cancelled, Boarding, Departed, Scheduled): ")
-        insert_new_flight_record(conn, date, time, origin_id, destination_id, pilot_id, status)
-        print()
+    def filter_mask(self, statuses=None, date_from=None, date_to=None):
+        numpy = self.numpy
+        mask = numpy.ones(len(self.columns["flight_id"]), dtype=bool)
+        if statuses:
+            codes = [self.status_names.index(status) for status in statuses if status in self.status_names]
+            mask &= numpy.isin(self.columns["status"], codes)
+        if date_from or date_to:
+            days = self.columns["departure"].astype("datetime64[D]")
+            if date_from:
+                mask &= days >= numpy.datetime64(date_from, "D")
+            if date_to:
+                mask &= days <= numpy.datetime64(date_to, "D")
+        return mask
 
-    #Update flight information functions (sub-menu)
-    elif selection == '4':
-        while True:
-            print("\nPlease select an option by entering the corresponding number\n")
-            print("1) Update Flight Date - Enter '1'")
-            print("2) Update Flight Time - Enter '2'")
-            print("3) Update Flight Status - Enter '3'")
-            print("4) Assign Pilot to Flight - Enter '4'")
-            print("5) Delete a Flight Record - Enter '5'")
-            print("6) Return to main menu - Enter '6'")
-            print()
-            option_selection = input("Select one of the following:\n")
-            if option_selection == '1':
-                flight_id = int(input("\nEnter the flight ID:\n"))
-                new_date = input("\nEnter the new date (YYYY-MM-DD):\n")
-                update_flight_date(conn, flight_id, new_date)
-            elif option_selection == '2':
-                flight_id = int(input("\nEnter the flight ID:\n"))
-                new_time = input("\nEnter the new time - 24hr Clock Format (HH:MM):\n")
-                update_flight_time(conn, flight_id, new_time)
-            elif option_selection == '3':
-                flight_id = int(input("\nEnter the flight ID:\n"))
-                new_status = input("\nEnter the new status ('Arrived', 'Cancelled', 'Boarding', 'Departed', 'Scheduled'):\n")
-                update_flight_status(conn, flight_id, new_status)
-            elif option_selection == '4':
-                flight_id = int(input("\nEnter the flight ID:\n"))
-                pilot_id = int(input("\nEnter the pilot ID:\n"))
-                assign_pilot_to_flight(conn, flight_id, pilot_id)
-            elif option_selection == '5':
-                flight_id = int(input("\nEnter the flight ID:\n"))
-                delete_flight_record(conn, flight_id)
-            elif option_selection == '6':
-                print("\nReturning to main menu\n")
-                break
+    def key_column(self, key, mask):
+        #The values of one grouping key for the flights in mask, as integers
+        numpy = self.numpy
+        if key not in analytics_keys or key == "route":
+            raise ValueError(f"Unknown analytics key '{key}' (choose from {', '.join(analytics_keys)})")
+        if key not in analytics_time_keys:
+            return self.columns[key][mask].astype(numpy.int64)
+        departures = self.columns["departure"][mask]
+        if key == "month":
+            return departures.astype("datetime64[M]").astype(numpy.int64)
+        days = departures.astype("datetime64[D]").astype(numpy.int64)
+        if key == "day":
+            return days
+        if key == "weekday":
+            return (days + 3) % 7
+        return departures.astype(numpy.int64) // 60 % 24
+
+    def key_labels(self, key, values):
+        #Integer key values -> the Python values returned to callers (ids, status names, "YYYY-MM-DD" days ...)
+        if key == "status":
+            return [self.status_names[value] for value in values.tolist()]
+        if key == "day":
+            return values.astype("datetime64[D]").astype(str).tolist()
+        if key == "month":
+            return values.astype("datetime64[M]").astype(str).tolist()
+        if key == "weekday":
+            return [analytics_weekdays[value] for value in values.tolist()]
+        return values.tolist()
+
+    def group_rows(self, keys, groups, order, *value_columns):
+        labels = [self.key_labels(key, values[order]) for key, values in zip(keys, groups)]
+        values = [column[order].tolist() for column in value_columns]
+        return list(zip(*labels, *values))
+
+    def expand_keys(self, keys):
+        #"route" is shorthand for origin and destination
+        keys = [part for key in keys for part in (("origin", "destination") if key == "route" else (key,))]
+        if not keys:
+            raise ValueError("Give at least one key to group by")
+        return keys
+
+    def grouped_counts(self, keys, mask):
+        #Returns (unique key combinations as a list of integer arrays, their counts). Every key is reduced to dense codes with
+        #numpy.unique and the codes combined into a single int64, so one more numpy.unique does the grouping.
+        numpy = self.numpy
+        if any(key in analytics_time_keys for key in keys):
+            mask = mask & ~numpy.isnat(self.columns["departure"])
+        uniques, codes = [], []
+        for key in keys:
+            values, inverse = numpy.unique(self.key_column(key, mask), return_inverse=True)
+            uniques.append(values)
+            codes.append(inverse.astype(numpy.int64))
+        shape = tuple(len(values) for values in uniques)
+        if 0 in shape:
+            return [numpy.empty(0, numpy.int64) for _ in keys], numpy.empty(0, numpy.int64)
+        combined, counts = numpy.unique(numpy.ravel_multi_index(codes, shape), return_counts=True)
+        positions = numpy.unravel_index(combined, shape)
+        return [values[position] for values, position in zip(uniques, positions)], counts
+
+    def count_by(self, keys, statuses=None, date_from=None, date_to=None, top=None):
+        #[(key values..., count), ...] with the largest groups first
+        keys = self.expand_keys(keys)
+        groups, counts = self.grouped_counts(keys, self.filter_mask(statuses, date_from, date_to))
+        order = self.numpy.argsort(-counts, kind="stable")[:top]
+        return self.group_rows(keys, groups, order, counts)
+
+    def ratio_by(self, keys, status, date_from=None, date_to=None, top=None):
+        #[(key values..., flights with status, all flights, ratio), ...] with the highest ratios first, e.g. the cancellation
+        #ratio per origin. The status counts are found with a searchsorted lookup into the sorted groups of all flights.
+        numpy = self.numpy
+        keys = self.expand_keys(keys)
+        mask = self.filter_mask(None, date_from, date_to)
+        groups, totals = self.grouped_counts(keys, mask)
+        matching = numpy.zeros(len(totals), dtype=numpy.int64)
+        if status in self.status_names and len(totals):
+            status_groups, status_counts = self.grouped_counts(keys, mask & (self.columns["status"] == self.status_names.index(status)))
+            if len(status_counts):
+                shape = tuple(int(values.max()) + 1 - int(values.min()) for values in groups)
+                offsets = [int(values.min()) for values in groups]
+                group_index = numpy.ravel_multi_index([values - offset for values, offset in zip(groups, offsets)], shape)
+                status_index = numpy.ravel_multi_index([values - offset for values, offset in zip(status_groups, offsets)], shape)
+                matching[numpy.searchsorted(group_index, status_index)] = status_counts
+        ratios = (matching / numpy.maximum(totals, 1)).round(4)
+        order = numpy.lexsort((-totals, -ratios))[:top]
+        return self.group_rows(keys, groups, order, matching, totals, ratios)
+
+    def histogram(self, key, statuses=None, date_from=None, date_to=None):
+        #[(bin, count), ...] for hour, weekday, day or month in time order, including the empty bins between the first and last
+        numpy = self.numpy
+        if key not in analytics_time_keys:
+            raise ValueError(f"Histograms are by {', '.join(sorted(analytics_time_keys))}")
+        mask = self.filter_mask(statuses, date_from, date_to) & ~numpy.isnat(self.columns["departure"])
+        values = self.key_column(key, mask)
+        if key in ("hour", "weekday"):
+            first, counts = 0, numpy.bincount(values, minlength=24 if key == "hour" else 7)
+        elif len(values):
+            first = int(values.min())
+            counts = numpy.bincount(values - first)
+        else:
+            first, counts = 0, numpy.empty(0, numpy.int64)
+        return list(zip(self.key_labels(key, numpy.arange(first, first + len(counts))), counts.tolist()))
+
+#One analytics engine per connection, refreshed each time it is asked for and dropped along with the connection
+analytics_engines = ConnectionRegistry()
+
+def flight_analytics(conn):
+    engine = analytics_engines.get(conn)
+    if engine is None:
+        engine = FlightAnalytics(conn)
+        analytics_engines[conn] = engine
+    else:
+        engine.refresh()
+    return engine
+
+def analytics_label(conn, key, value):
+    #Airport and pilot names for the printed output
+    cache = dimension_cache(conn)
+    if key in ("origin", "destination"):
+        return cache["destinations"].get(value, (value,))[0]
+    if key == "pilot":
+        pilot = cache["pilots"].get(value)
+        return f"{pilot[0]} {pilot[1]}" if pilot else value
+    return value
+
+def print_analytics_rows(conn, keys, rows, value_columns):
+    keys = [part for key in keys for part in (("origin", "destination") if key == "route" else (key,))]
+    print("\nFormat: " + ", ".join(keys + value_columns))
+    for row in rows:
+        print(tuple(analytics_label(conn, key, value) for key, value in zip(keys, row)) + row[len(keys):])
+
+@instrumented
+def analytics_count(conn, keys, statuses=None, date_from=None, date_to=None, top=None):
+    rows = flight_analytics(conn).count_by(keys, statuses, date_from, date_to, top)
+    print_analytics_rows(conn, keys, rows, ["count_of_flights"])
+    return rows
+
+@instrumented
+def analytics_ratio(conn, keys, status, date_from=None, date_to=None, top=None):
+    rows = flight_analytics(conn).ratio_by(keys, status, date_from, date_to, top)
+    print_analytics_rows(conn, keys, rows, [f"{status.lower()}_flights", "all_flights", "ratio"])
+    return rows
 
-    #Update Destinations functions (sub-menu)
-    elif selection == '5':
+@instrumented
+def analytics_histogram(conn, key, statuses=None, date_from=None, date_to=None):
+    rows = flight_analytics(conn).histogram(key, statuses, date_from, date_to)
+    print(f"\nFormat: {key}, count_of_flights")
+    width = max((count for _, count in rows), default=0)
+    for label, count in rows:
+        bar = "#" * round(40 * count / width) if width else ""
+        print(f"{label!s:>10} {count:>10} {bar}")
+    return rows
+
+#Route graph for multi-leg connections (python main.py flights connection ...). Every flight that isn't cancelled is an
+#edge origin -> destination at its departure minute, kept in one departure-sorted list per route:
+#routes[origin_id][destination_id] = [(departure_minutes, flight_id), ...]. Flights only store a departure, so a leg is
+#assumed to arrive flight_minutes after it leaves.
+#connection() is a time-dependent Dijkstra over airports labelled with their earliest arrival: from each airport it
+#bisects every outgoing route for the first departure at least min_connection minutes after landing (any time after
+#the start at the origin). As every leg takes the same time, catching the earliest departure is always best, so the
+#first time the destination is popped gives the earliest possible arrival.
+#refresh() re-reads only the flights the change log (migration 10) shows were inserted, updated or deleted since the
+#last refresh, moving each one to its new place in the route lists.
+route_min_connection_minutes = 45
+route_flight_minutes = 120
+route_search_days = 1
+
+route_flights_query = f"""
+SELECT flight_id, origin_id, destination_id, status, {departure_minutes_sql}
+FROM flights
+"""
+
+def minutes_to_departure(minutes):
+    return (datetime.datetime(1970, 1, 1) + datetime.timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M")
+
+def departure_to_minutes(departure):
+    return int((datetime.datetime.fromisoformat(departure) - datetime.datetime(1970, 1, 1)).total_seconds()) // 60
+
+class RouteGraph:
+    def __init__(self, conn):
+        self.conn_ref = connection_reference(conn)
+        self.refresh(full=True)
+
+    @property
+    def conn(self):
+        #Held weakly for the same reason as FlightAnalytics.conn
+        return self.conn_ref()
+
+    def add_flight(self, flight_id, origin_id, destination_id, status, minutes):
+        #Returns the route's departure list if the flight was appended to it; the caller re-sorts the lists it touched
+        if status == "Cancelled" or minutes is None:
+            return None
+        self.flights[flight_id] = (origin_id, destination_id, minutes)
+        departures = self.routes.setdefault(origin_id, {}).setdefault(destination_id, [])
+        departures.append((minutes, flight_id))
+        return departures
+
+    def remove_flight(self, flight_id):
+        import bisect
+        flight = self.flights.pop(flight_id, None)
+        if flight is None:
+            return
+        origin_id, destination_id, minutes = flight
+        departures = self.routes[origin_id][destination_id]
+        index = bisect.bisect_left(departures, (minutes, flight_id))
+        if index < len(departures) and departures[index] == (minutes, flight_id):
+            del departures[index]
+
+    def load(self, where="", params=()):
+        cursor = self.conn.execute(route_flights_query + where, params)
+        loaded = 0
+        touched = {}
         while True:
-            print("\nPlease select an option by entering the corresponding number\n")
-            print("1) View All Destinations - Enter '1'")
-            print("2) Add New Destination - Enter '2'")
-            print("3) Delete A Destination - Enter '3'")
-            print("4) Update a Flight Destination - Enter '4'")
-            print("5) Return to Main Menu - Enter '5'")
-            print()
-            option_selection = input("Select one of the following:\n")
-            if option_selection == '1':
-                view_all_destinations(conn)
-            elif option_selection == '2':
-                airport = input("\nEnter the airport name (case sensitive):\n")
-                city = input("\nEnter the city name (case sensitive):\n")
-                country = input("\nEnter the country name (case sensitive):\n")
-                add_destination(conn, airport, city, country)
-            elif option_selection == '3':
-                airport = input("\nEnter the airport name (case sensitive):\n")
-                delete_destination(conn, airport)
-            elif option_selection == '4':
-                flight_id = int(input("\nEnter the flight ID:\n"))
-                destination_id = int(input("\nEnter the new destination_id:\n"))
-                update_flight_destination(conn, flight_id, destination_id)
-            elif option_selection == '5':
-                print("\nReturning to main menu\n")
+            rows = cursor.fetchmany(analytics_fetch_size)
+            if not rows:
                 break
+            for row in rows:
+                departures = self.add_flight(*row)
+                if departures is not None:
+                    touched[id(departures)] = departures
+            loaded += len(rows)
+        for departures in touched.values():
+            departures.sort()
+        return loaded
+
+    def apply_changes(self, flight_ids):
+        flight_ids = sorted(flight_ids)
+        for flight_id in flight_ids:
+            self.remove_flight(flight_id)
+        loaded = 0
+        for start in range(0, len(flight_ids), batch_lookup_size):
+            chunk = flight_ids[start:start + batch_lookup_size]
+            loaded += self.load(f"WHERE flight_id IN ({', '.join('?' * len(chunk))})", chunk)
+        return loaded
+
+    def refresh(self, full=False):
+        #Brings the graph up to date and returns how many flights were read
+        own_transaction = not self.conn.in_transaction
+        if own_transaction:
+            self.conn.execute("BEGIN")
+        try:
+            changes = None if full else flight_changes_since(self.conn, self.change_seq)
+            if changes is None or len(changes[1]) > max(len(self.flights) // 2, analytics_fetch_size):
+                self.change_seq = change_log_position(self.conn)
+                self.flights = {}
+                self.routes = {}
+                loaded = self.load()
             else:
-                print("\nInvalid input. Please try again.\n")
-                
+                self.change_seq, flight_ids = changes
+                loaded = self.apply_changes(flight_ids)
+        finally:
+            if own_transaction:
+                self.conn.commit()
+        return loaded
+
+    def connection(self, origin_id, destination_id, start_minutes, min_connection=None, flight_minutes=None, search_days=None):
+        #Earliest arriving itinerary leaving origin_id at or after start_minutes, as [(flight_id, from_id, to_id,
+        #departure_minutes, arrival_minutes), ...], or None if there isn't one departing before the end of the search window
+        import heapq
+        import bisect
+        if min_connection is None:
+            min_connection = route_min_connection_minutes
+        if flight_minutes is None:
+            flight_minutes = route_flight_minutes
+        if search_days is None:
+            search_days = route_search_days
+        latest_departure = (start_minutes // 1440 + 1 + search_days) * 1440
+        best_arrival = {origin_id: start_minutes}
+        previous = {}
+        queue = [(start_minutes, origin_id)]
+        while queue:
+            arrival, airport = heapq.heappop(queue)
+            if airport == destination_id:
+                legs = []
+                while airport != origin_id:
+                    leg = previous[airport]
+                    legs.append(leg)
+                    airport = leg[1]
+                return legs[::-1]
+            if arrival > best_arrival[airport]:
+                continue
+            ready = arrival if airport == origin_id else arrival + min_connection
+            for next_airport, departures in self.routes.get(airport, {}).items():
+                index = bisect.bisect_left(departures, (ready,))
+                if index == len(departures) or departures[index][0] >= latest_departure:
+                    continue
+                departure, flight_id = departures[index]
+                next_arrival = departure + flight_minutes
+                if next_arrival < best_arrival.get(next_airport, latest_departure + flight_minutes):
+                    best_arrival[next_airport] = next_arrival
+                    previous[next_airport] = (flight_id, airport, next_airport, departure, next_arrival)
+                    heapq.heappush(queue, (next_arrival, next_airport))
+        return None
 
-    #View Pilot Schedule & Information (sub-menu)
-    elif selection == '6':
+#One route graph per connection, refreshed each time it is asked for and dropped along with the connection
+route_graphs = ConnectionRegistry()
+
+def route_graph(conn):
+    graph = route_graphs.get(conn)
+    if graph is None:
+        graph = RouteGraph(conn)
+        route_graphs[conn] = graph
+    else:
+        graph.refresh()
+    return graph
+
+def find_destination_id(conn, name):
+    #A destination id, or an airport name, or failing that a city name (case-insensitive)
+    destinations = dimension_cache(conn)["destinations"]
+    if str(name).isdigit() and int(name) in destinations:
+        return int(name)
+    for field in (0, 1):
+        matches = [destination_id for destination_id, details in destinations.items() if details[field].lower() == str(name).lower()]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise ValueError(f"'{name}' matches {len(matches)} destinations; use the airport name or destination id")
+    raise ValueError(f"No destination called '{name}'")
+
+@instrumented
+def find_connection(conn, origin, destination, date, after="00:00", min_connection=None, flight_minutes=None, search_days=None):
+    origin_id = find_destination_id(conn, origin)
+    destination_id = find_destination_id(conn, destination)
+    try:
+        start_minutes = departure_to_minutes(f"{date} {after}")
+    except ValueError:
+        raise ValueError(f"'{date} {after}' is not a YYYY-MM-DD date and HH:MM time")
+    graph = route_graph(conn)
+    start = perf_counter()
+    legs = graph.connection(origin_id, destination_id, start_minutes, min_connection, flight_minutes, search_days)
+    elapsed_ms = (perf_counter() - start) * 1000
+    destinations = dimension_cache(conn)["destinations"]
+    if not legs:
+        print(f"\nNo connection from {destinations[origin_id][0]} to {destinations[destination_id][0]} after {date} {after} ({elapsed_ms:.1f} ms)\n")
+        return legs
+    print(f"\nFormat: flight_id, from, to, departure, arrival ({elapsed_ms:.1f} ms)")
+    for flight_id, from_id, to_id, departure, arrival in legs:
+        print((flight_id, destinations[from_id][0], destinations[to_id][0], minutes_to_departure(departure), minutes_to_departure(arrival)))
+    total = legs[-1][4] - legs[0][3]
+    print(f"\n{len(legs)} legs, arriving {minutes_to_departure(legs[-1][4])} after {total // 60}h {total % 60:02d}m\n")
+    return legs
+
+#Status advancement (python main.py advance-statuses). Flights move along Scheduled -> Boarding -> Departed -> Arrived
+#as their departure comes and goes: boarding starts boarding_minutes before the departure, and a flight counts as
+#departed departed_minutes after it and as arrived arrived_minutes after it. Cancelled and Arrived flights never change.
+#The offsets come from the command line, the [status_advancement] section of the config file or the defaults below.
+#A tick is one transaction with one set-based UPDATE per transition, run in state machine order, so a flight that is
+#long overdue steps through every status in between within the same tick. Each UPDATE is a range of
+#idx_flights_status_departure (migration 9) - status = ? AND (date, time) <= (?, ?) - so it only reads the rows that are due.
+flight_status_transitions = {"Scheduled": "Boarding", "Boarding": "Departed", "Departed": "Arrived"}
+default_status_offsets = {"boarding_minutes": 40, "departed_minutes": 0, "arrived_minutes": route_flight_minutes}
+
+advance_status_query = """
+UPDATE flights
+SET status = ?
+WHERE status = ? AND (date, time) <= (?, ?)
+"""
+
+def status_advancement_offsets(boarding_minutes=None, departed_minutes=None, arrived_minutes=None, config=None):
+    #Returns {new status: minutes after departure at which a flight gets it}
+    if config is None:
+        config = load_config()
+    given = {"boarding_minutes": boarding_minutes, "departed_minutes": departed_minutes, "arrived_minutes": arrived_minutes}
+    values = {}
+    for name, default in default_status_offsets.items():
+        value = given[name] if given[name] is not None else config.get("status_advancement", name, fallback=default)
+        try:
+            values[name] = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid {name} '{value}': expected a whole number of minutes")
+    offsets = {"Boarding": -values["boarding_minutes"], "Departed": values["departed_minutes"], "Arrived": values["arrived_minutes"]}
+    if not offsets["Boarding"] <= offsets["Departed"] <= offsets["Arrived"]:
+        raise ValueError("Boarding must start before a flight departs, and a flight must depart before it arrives")
+    return offsets
+
+def parse_status_time(now):
+    if now is None:
+        return datetime.datetime.now().replace(second=0, microsecond=0)
+    if isinstance(now, datetime.datetime):
+        return now
+    try:
+        return datetime.datetime.strptime(now, "%Y-%m-%d %H:%M")
+    except ValueError:
+        raise ValueError(f"'{now}' is not a 'YYYY-MM-DD HH:MM' time")
+
+@instrumented
+def advance_flight_statuses(conn, now=None, offsets=None, dry_run=False):
+    #Runs one tick as of now (default the current local time) and returns {(old status, new status): flights changed}
+    now = parse_status_time(now)
+    if offsets is None:
+        offsets = status_advancement_offsets()
+    changed = {}
+    begin_write(conn, "IMMEDIATE")
+    try:
+        for status, next_status in flight_status_transitions.items():
+            due = (now - datetime.timedelta(minutes=offsets[next_status])).strftime("%Y-%m-%d %H:%M")
+            cursor = conn.execute(advance_status_query, (next_status, status, due[:10], due[11:]))
+            changed[(status, next_status)] = cursor.rowcount
+        if dry_run:
+            rollback_write(conn)
+        else:
+            commit_write(conn)
+    except sqlite3.Error:
+        rollback_write(conn)
+        raise
+    summary = ", ".join(f"{count} {status} -> {next_status}" for (status, next_status), count in changed.items())
+    print(f"{'Would advance' if dry_run else 'Advanced'} statuses as of {now:%Y-%m-%d %H:%M}: {summary}")
+    return changed
+
+def run_status_advancement(conn, every=None, now=None, offsets=None, dry_run=False):
+    #One tick, or with every=N a tick every N seconds until interrupted
+    import time
+    if offsets is None:
+        offsets = status_advancement_offsets()
+    if every is None:
+        return advance_flight_statuses(conn, now, offsets, dry_run)
+    try:
         while True:
-            print("\nPlease select an option by entering the corresponding number\n")
-            print("1) View All Pilot Information - Enter '1'")
-            print("2) View Schedule for a Specific Pilot - Enter '2'")
-            print("3) View Number of Flights Assigned to Each Pilot - Enter '3'")
-            print("4) View Most Experienced Pilots - Enter '4'")
-            print("5) View Least Experienced Pilots - Enter '5'")
-            print("6) Return to Main Menu - Enter '6'")
-            print()
-            option_selection = input("Select one of the following:\n")
-            if option_selection == '1':
-                view_all_pilots(conn)
-            elif option_selection == '2':
-                pilot_id = int(input("\nEnter the pilot ID:\n"))
-                filter_by_pilot(conn, pilot_id)
-            elif option_selection == '3':
-                count_flights_by_pilot(conn)
-            elif option_selection == '4':
-                most_experienced_pilots(conn)
-            elif option_selection == '5':
-                least_experienced_pilots(conn)
-            elif option_selection == '6':
-                print("\nReturning to main menu\n")
-                break
+            advance_flight_statuses(conn, None, offsets, dry_run)
+            time.sleep(every)
+    except KeyboardInterrupt:
+        print("\nStatus advancement stopped")
+
+#Benchmark runner. For each size a synthetic database is generated once into the data directory (keyed by size and
+#seed) and copied for every run, because the write benchmarks change the data. Each function is called repeatedly with
+#randomly chosen (but seeded) arguments and its output discarded, until it has run `repeat` times or used up its time limit.
+def percentile(sorted_values, percent):
+    #Nearest-rank percentile of an already sorted list
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+def benchmark_cases(conn, rng):
+    #Returns [(function_name, kind, rows_per_call, call)] where call() runs the function once with fresh arguments
+    cache = dimension_cache(conn)
+    destinations = list(cache["destinations"].values())
+    pilot_ids = list(cache["pilots"])
+    destination_ids = list(cache["destinations"])
+    first_id, last_id = conn.execute("SELECT MIN(flight_id), MAX(flight_id) FROM flights").fetchone()
+    first_date, last_date = conn.execute("SELECT MIN(date), MAX(date) FROM flights").fetchone()
+    first_day = datetime.date.fromisoformat(first_date)
+    day_count = (datetime.date.fromisoformat(last_date) - first_day).days + 1
+    batch_size = 100
+
+    def random_date():
+        return (first_day + datetime.timedelta(days=rng.randrange(day_count))).isoformat()
+
+    def random_time():
+        return f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 5):02d}"
+
+    def random_flight_id():
+        return rng.randint(first_id, last_id)
+
+    def departure_window():
+        start = f"{random_date()} {random_time()}"
+        return start, start[:11] + "23:59"
+
+    return [
+        ("all_flight_details", "read", None, lambda: all_flight_details(conn)),
+        ("flights_by_airport", "read", None, lambda: flights_by_airport(conn, rng.choice(destinations)[0])),
+        ("flights_by_airport_prefix", "read", None, lambda: flights_by_airport(conn, rng.choice(destinations)[0][:3], prefix=True)),
+        ("flights_by_city", "read", None, lambda: flights_by_city(conn, rng.choice(destinations)[1])),
+        ("flights_by_status", "read", None, lambda: flights_by_status(conn, rng.choice(flight_statuses))),
+        ("flights_filtered_by_date", "read", None, lambda: flights_filtered_by_date(conn, random_date())),
+        ("flights_departing_between", "read", None, lambda: flights_departing_between(conn, *departure_window())),
+        ("search_flights", "read", None, lambda: search_flights(conn, destination_city=rng.choice(destinations)[1],
+                                                              statuses=[rng.choice(flight_statuses)], date_from=random_date())),
+        ("flights_by_keywords", "read", None, lambda: flights_by_keywords(conn, rng.choice(destinations)[1])),
+        ("search_directory", "read", None, lambda: search_directory(conn, rng.choice(destinations)[0])),
+        ("filter_by_pilot", "read", None, lambda: filter_by_pilot(conn, rng.choice(pilot_ids))),
+        ("view_all_destinations", "read", None, lambda: view_all_destinations(conn)),
+        ("view_all_pilots", "read", None, lambda: view_all_pilots(conn)),
+        ("most_experienced_pilots", "read", None, lambda: most_experienced_pilots(conn)),
+        ("least_experienced_pilots", "read", None, lambda: least_experienced_pilots(conn)),
+        ("count_flights_by_pilot", "read", None, lambda: count_flights_by_pilot(conn)),
+        ("count_flights_by_status", "read", None, lambda: count_flights_by_status(conn)),
+        ("most_popular_destinations", "read", None, lambda: most_popular_destinations(conn)),
+        ("least_popular_destinations", "read", None, lambda: least_popular_destinations(conn)),
+        ("insert_new_flight_record", "write", 1, lambda: insert_new_flight_record(
+            conn, random_date(), random_time(), *rng.sample(destination_ids, 2), rng.choice(pilot_ids), "Scheduled")),
+        ("update_flight_date", "write", 1, lambda: update_flight_date(conn, random_flight_id(), random_date())),
+        ("update_flight_time", "write", 1, lambda: update_flight_time(conn, random_flight_id(), random_time())),
+        ("update_flight_status", "write", 1, lambda: update_flight_status(conn, random_flight_id(), rng.choice(flight_statuses))),
+        ("assign_pilot_to_flight", "write", 1, lambda: assign_pilot_to_flight(conn, random_flight_id(), rng.choice(pilot_ids))),
+        ("update_flight_destination", "write", 1, lambda: update_flight_destination(conn, random_flight_id(), rng.choice(destination_ids))),
+        ("update_flight_status_batch", "write", batch_size, lambda: update_flight_status_batch(
+            conn, [random_flight_id() for _ in range(batch_size)], rng.choice(flight_statuses))),
+        ("delete_flight_record", "write", 1, lambda: delete_flight_record(conn, random_flight_id()))
+    ]
+
+def benchmark_database(data_dir, size, random_seed, profile):
+    #Returns the path of the pristine generated database for this size/seed, generating it on first use
+    import contextlib
+    path = os.path.join(data_dir, f"flights_{size}_seed{random_seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        partial_path = path + ".partial"
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        generate_conn = connect(partial_path, profile)
+        try:
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                apply_migrations(generate_conn)
+            generate_sample_data(generate_conn, size, random_seed)
+        finally:
+            generate_conn.close()
+        os.replace(partial_path, path)
+    return path
+
+def run_benchmarks(sizes, random_seed=42, repeat=20, time_limit=10.0, data_dir="benchmark_data",
+                   output="benchmark_results.json", profile=None, functions=None):
+    import contextlib
+    import json
+    import platform
+    import random
+    import shutil
+    import subprocess
+    results = []
+    for size in sizes:
+        pristine_path = benchmark_database(data_dir, size, random_seed, profile)
+        run_path = os.path.join(data_dir, "benchmark_run.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(run_path + suffix):
+                os.remove(run_path + suffix)
+        shutil.copyfile(pristine_path, run_path)
+
+        bench_conn = connect(run_path, profile)
+        rng = random.Random(random_seed)
+        print(f"\n -- {size} flights -- \n")
+        try:
+            with open(os.devnull, "w") as devnull:
+                for function_name, kind, rows_per_call, call in benchmark_cases(bench_conn, rng):
+                    if functions and function_name not in functions:
+                        continue
+                    timings = []
+                    started = perf_counter()
+                    while len(timings) < repeat and (not timings or perf_counter() - started < time_limit):
+                        with contextlib.redirect_stdout(devnull):
+                            call_start = perf_counter()
+                            try:
+                                call()
+                            except ValueError:
+                                #A write refused for double-booking a pilot has still done the work being timed
+                                pass
+                            timings.append(perf_counter() - call_start)
+                    total = sum(timings)
+                    timings.sort()
+                    result = {
+                        "size": size,
+                        "function": function_name,
+                        "kind": kind,
+                        "calls": len(timings),
+                        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+                        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+                        "mean_ms": round(total / len(timings) * 1000, 3),
+                        "calls_per_sec": round(len(timings) / total, 2) if total > 0 else None
+                    }
+                    if rows_per_call is not None:
+                        result["rows_per_sec"] = round(len(timings) * rows_per_call / total, 2) if total > 0 else None
+                    results.append(result)
+                    print(f"{function_name:<28} p50 {result['p50_ms']:>10.3f}ms  p95 {result['p95_ms']:>10.3f}ms  "
+                          f"{result['calls_per_sec']}/sec ({len(timings)} calls)")
+        finally:
+            bench_conn.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(run_path + suffix):
+                    os.remove(run_path + suffix)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python_version": platform.python_version(),
+        "sqlite_version": sqlite3.sqlite_version,
+        "profile": profile or os.environ.get("FLIGHT_DB_PROFILE") or "default",
+        "random_seed": random_seed,
+        "repeat": repeat,
+        "time_limit_seconds": time_limit,
+        "results": results
+    }
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nBenchmark results written to {output}")
+    return report
+
+#Batch mode runs a file of commands (the same ones the command line accepts, one per line) on one connection,
+#with one transaction per batch_size commands. Every line of a batch is parsed before any of it runs, and a failing
+#command rolls back its whole batch; earlier batches stay committed.
+def read_batch_commands(path):
+    #Generator of (line_number, argument list) for each command in the file, skipping blank lines and comments
+    import shlex
+    with open(path, encoding="utf-8") as batch_file:
+        for line_number, line in enumerate(batch_file, 1):
+            command = shlex.split(line, comments=True)
+            if command:
+                yield line_number, command
+
+def run_batch_file(conn, path, batch_size=1000):
+    import shlex
+    command_parser = build_command_parser()
+    commands = read_batch_commands(path)
+    executed = 0
+    start = perf_counter()
+    while True:
+        batch = list(itertools.islice(commands, batch_size))
+        if not batch:
+            break
+        parsed = []
+        for line_number, command in batch:
+            try:
+                parsed.append((line_number, command, command_parser.parse_args(command)))
+            except SystemExit:
+                raise ValueError(f"Batch stopped at line {line_number} ('{shlex.join(command)}'): invalid command. "
+                                 f"{executed} commands were committed before it.")
+        begin_batch(conn)
+        try:
+            for line_number, command, command_args in parsed:
+                command_args.run(conn, command_args)
+        except (sqlite3.Error, ValueError) as error:
+            end_batch(conn, commit=False)
+            raise ValueError(f"Batch stopped at line {line_number} ('{shlex.join(command)}'): {error}. "
+                             f"Its batch was rolled back; {executed} commands were committed before it.")
+        except BaseException:
+            end_batch(conn, commit=False)
+            raise
+        end_batch(conn)
+        executed += len(parsed)
+    elapsed = perf_counter() - start
+    rate = executed / elapsed if elapsed > 0 else 0
+    print(f"\nRan {executed} commands from {path} in {elapsed:.2f}s ({rate:,.0f} commands/sec)")
+    return executed
+
+#Asyncio API. Reads run on a bounded thread pool where every worker thread owns one read-only connection, so a long
+#report only ties up its own worker while the other readers keep serving requests from the same WAL-mode file.
+#All writes go through one dedicated writer thread and connection, which serialises them in the order they were awaited
+#(SQLite allows one writer at a time anyway, this just queues them in Python instead of on the busy timeout).
+#The read methods return rows rather than printing them; listings return one keyset page (pass the last flight_id back
+#as after_id for the next one). Writes return the new id or the number of rows changed.
+#
+#    async with AsyncFlightDatabase("flight_management.db", readers=8) as db:
+#        page = await db.flights_by_status("Scheduled")
+#        await db.update_flight_status(12, "Cancelled")
+class AsyncFlightDatabase:
+    def __init__(self, path=None, profile=None, readers=4):
+        from concurrent.futures import ThreadPoolExecutor
+        self.path = path
+        self.profile = profile
+        self.connections = []
+        self.thread_state = threading.local()
+        self.connections_lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flight-writer", initializer=self.open_connection)
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="flight-reader",
+                                          initializer=self.open_connection, initargs=(True,))
+
+    def open_connection(self, read_only=False):
+        conn = connect(self.path, self.profile, read_only=read_only, check_same_thread=False)
+        self.thread_state.conn = conn
+        with self.connections_lock:
+            self.connections.append(conn)
+
+    def call(self, function, *function_args, **function_kwargs):
+        return function(self.thread_state.conn, *function_args, **function_kwargs)
+
+    async def run(self, executor, function, *function_args, **function_kwargs):
+        import asyncio
+        call = functools.partial(self.call, function, *function_args, **function_kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    async def read(self, function, *function_args, **function_kwargs):
+        #Runs function(conn, ...) on a reader connection, e.g. await db.read(filter_by_pilot_rows, 7)
+        return await self.run(self.readers, function, *function_args, **function_kwargs)
+
+    async def write(self, function, *function_args, **function_kwargs):
+        #Runs function(conn, ...) on the writer connection, one call at a time
+        return await self.run(self.writer, function, *function_args, **function_kwargs)
+
+    async def open(self):
+        #The schema is brought up to date by the writer before any read-only connection is opened
+        await self.write(init_schema)
+        return self
+
+    def close(self):
+        self.writer.shutdown(wait=True)
+        self.readers.shutdown(wait=True)
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc_info):
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    #Flight listings: one page of flight details rows each
+    async def all_flight_details(self, after_id=0, page_size=flight_page_size):
+        return await self.read(fetch_flight_page, all_flight_details_query, (), after_id, page_size)
+
+    async def flights_by_airport(self, airport, prefix=False, after_id=0, page_size=flight_page_size):
+        return await self.search_flights(after_id, page_size, destination_airport=airport, prefix_match=prefix)
+
+    async def flights_by_city(self, city, prefix=False, after_id=0, page_size=flight_page_size):
+        return await self.search_flights(after_id, page_size, destination_city=city, prefix_match=prefix)
+
+    async def flights_by_status(self, status, after_id=0, page_size=flight_page_size):
+        return await self.read(fetch_flight_page, flights_by_status_query, (status,), after_id, page_size)
+
+    async def flights_filtered_by_date(self, date, after_id=0, page_size=flight_page_size):
+        return await self.read(fetch_flight_page, flights_filtered_by_date_query, (date,), after_id, page_size)
+
+    async def search_flights(self, after_id=0, page_size=flight_page_size, **filters):
+        sql, params = build_flight_query(**filters)
+        return await self.read(fetch_flight_page, sql, params, after_id, page_size)
+
+    async def flights_departing_between(self, start=None, end=None, include_start=True, include_end=False,
+                                        descending=False, after_departure=None, after_flight_id=None,
+                                        page_size=flight_page_size):
+        #One page in departure order. For the next page pass the last row's "date time" as after_departure and its
+        #flight_id as after_flight_id, keeping start and end unchanged: the (departure, flight_id) cursor doesn't skip
+        #other flights that share the last departure the way moving start past it would.
+        after = (after_departure, after_flight_id) if after_departure is not None else None
+        pages = functools.partial(iter_departure_pages, start=start, end=end, include_start=include_start,
+                                  include_end=include_end, descending=descending, page_size=page_size, after=after)
+        return await self.read(lambda conn: next(pages(conn), []))
+
+    async def flights_by_keywords(self, text, after_id=0, page_size=flight_page_size):
+        def keyword_page(conn):
+            keyword_query = build_keyword_query(conn, text)
+            if keyword_query is None:
+                return []
+            return fetch_flight_page(conn, *keyword_query, after_id, page_size)
+        return await self.read(keyword_page)
+
+    async def search_directory(self, text, limit=10):
+        return await self.read(search_directory, text, limit)
+
+    #Destinations, pilots and reports
+    async def view_all_destinations(self):
+        return await self.read(lambda conn: [(destination_id, *details) for destination_id, details in dimension_cache(conn)["destinations"].items()])
+
+    async def view_all_pilots(self):
+        return await self.read(lambda conn: [(pilot_id, *details) for pilot_id, details in dimension_cache(conn)["pilots"].items()])
+
+    async def filter_by_pilot(self, pilot_id):
+        return await self.read(filter_by_pilot_rows, pilot_id)
+
+    async def query(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def most_experienced_pilots(self):
+        return await self.query(most_experienced_pilots_query)
+
+    async def least_experienced_pilots(self):
+        return await self.query(least_experienced_pilots_query)
+
+    async def count_flights_by_pilot(self):
+        return await self.query(count_flights_by_pilot_query)
+
+    async def most_popular_destinations(self):
+        return await self.query(most_popular_destinations_query)
+
+    async def least_popular_destinations(self):
+        return await self.query(least_popular_destinations_query)
+
+    async def count_flights_by_status(self):
+        return await self.query(count_flights_by_status_query)
+
+    #Writes
+    async def insert_new_flight_record(self, date, time, origin_id, destination_id, pilot_id, status, allow_conflicts=False):
+        return await self.write(insert_new_flight_record, date, time, origin_id, destination_id, pilot_id, status, allow_conflicts)
+
+    async def update_flight_date(self, flight_id, new_date, allow_conflicts=False):
+        return await self.write(update_flight_date, flight_id, new_date, allow_conflicts)
+
+    async def update_flight_time(self, flight_id, new_time, allow_conflicts=False):
+        return await self.write(update_flight_time, flight_id, new_time, allow_conflicts)
+
+    async def update_flight_status(self, flight_id, new_status, allow_conflicts=False):
+        return await self.write(update_flight_status, flight_id, new_status, allow_conflicts)
+
+    async def assign_pilot_to_flight(self, flight_id, pilot_id, allow_conflicts=False):
+        return await self.write(assign_pilot_to_flight, flight_id, pilot_id, allow_conflicts)
+
+    async def update_flight_destination(self, flight_id, new_destination_id):
+        return await self.write(update_flight_destination, flight_id, new_destination_id)
+
+    async def delete_flight_record(self, flight_id):
+        return await self.write(delete_flight_record, flight_id)
+
+    async def update_flight_status_batch(self, updates, new_status=None, allow_conflicts=False):
+        return await self.write(update_flight_status_batch, updates, new_status, allow_conflicts)
+
+    async def add_destination(self, airport, city, country):
+        return await self.write(add_destination, airport, city, country)
+
+    async def delete_destination(self, airport):
+        return await self.write(delete_destination, airport)
+
+#HTTP/JSON read API (python main.py serve). Every request borrows a read-only connection from ReadConnectionPool, so at
+#most pool size queries run at once; a request that can't get a connection within the queue timeout gets a 503.
+#Connections are HTTP/1.1 keep-alive. Responses carry an ETag made of a per-server token and PRAGMA data_version from
+#a dedicated connection that never writes: its data_version changes whenever any other connection commits, so a client
+#repeating a request with If-None-Match gets a 304 without the query being run until the data has changed.
+#Flight listings are paginated with keyset pagination: ?after_id=<next_after_id from the previous page>&limit=N.
+api_default_limit = 100
+api_max_limit = 1000
+
+pilot_schedule_columns = ("pilot_id", "pilot_forename", "pilot_surname", "flight_id", "date", "time", "status",
+                          "origin_airport", "origin_city", "destination_airport", "destination_city")
+#Query string parameter -> build_flight_query keyword argument, for the single valued text filters of /flights
+api_flight_filters = ("origin_airport", "origin_city", "destination_airport", "destination_city", "date", "date_from",
+                      "date_to", "departure_from", "departure_to", "time_from", "time_to")
+
+class ReadConnectionPool:
+    def __init__(self, path=None, profile=None, size=8):
+        import queue
+        self.idle = queue.LifoQueue()
+        self.connections = [connect(path, profile, read_only=True, check_same_thread=False) for _ in range(size)]
+        for conn in self.connections:
+            self.idle.put(conn)
+        self.version_conn = connect(path, profile, read_only=True, check_same_thread=False)
+        self.version_lock = threading.Lock()
+
+    def acquire(self, timeout):
+        #Returns an idle connection, or None if none became free within timeout seconds
+        import queue
+        try:
+            return self.idle.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    def data_version(self):
+        with self.version_lock:
+            return self.version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        for conn in self.connections + [self.version_conn]:
+            conn.close()
+
+def api_param(params, name, convert=str):
+    values = params.get(name)
+    if not values or values[0] == "":
+        return None
+    try:
+        return convert(values[0])
+    except ValueError:
+        raise ValueError(f"Invalid value for {name}: {values[0]}")
+
+def api_flag(params, name):
+    return api_param(params, name) in ("1", "true", "yes")
+
+def api_paging(params):
+    after_id = api_param(params, "after_id", int) or 0
+    limit = api_param(params, "limit", int)
+    if limit is None:
+        limit = api_default_limit
+    if not 1 <= limit <= api_max_limit:
+        raise ValueError(f"limit must be between 1 and {api_max_limit}")
+    return after_id, limit
+
+def api_rows(rows, columns):
+    return [dict(zip(columns, row)) for row in rows]
+
+def api_flight_page(rows, limit):
+    return {
+        "flights": api_rows(rows, flight_detail_columns),
+        "next_after_id": rows[-1][0] if len(rows) == limit else None
+    }
+
+def api_flights(conn, params):
+    filters = {name: api_param(params, name) for name in api_flight_filters}
+    filters["statuses"] = params.get("status")
+    filters["pilot_id"] = api_param(params, "pilot_id", int)
+    filters["prefix_match"] = api_flag(params, "prefix")
+    after_id, limit = api_paging(params)
+    sql, sql_params = build_flight_query(**filters)
+    return api_flight_page(fetch_flight_page(conn, sql, sql_params, after_id, limit), limit)
+
+def api_flight_search(conn, params):
+    text = api_param(params, "q")
+    if not text:
+        raise ValueError("q is required")
+    after_id, limit = api_paging(params)
+    keyword_query = build_keyword_query(conn, text)
+    if keyword_query is None:
+        return api_flight_page([], limit)
+    return api_flight_page(fetch_flight_page(conn, *keyword_query, after_id, limit), limit)
+
+def api_pilot_schedule(conn, params, pilot_id):
+    rows = filter_by_pilot_rows(conn, pilot_id)
+    if not rows:
+        return None
+    return {"schedule": api_rows([row for row in rows if row[3] is not None], pilot_schedule_columns)}
+
+def api_changes(conn, params):
+    #Clients keep their own position: pass next_after_seq back as after_seq
+    after_seq = api_param(params, "after_seq", int)
+    if after_seq is None:
+        after_seq = change_log_compacted_through(conn)
+    limit = api_param(params, "limit", int)
+    if limit is None:
+        limit = api_default_limit
+    if not 1 <= limit <= api_max_limit:
+        raise ValueError(f"limit must be between 1 and {api_max_limit}")
+    rows = changes_after(conn, after_seq, limit, params.get("table"))
+    return {
+        "changes": api_rows(rows, change_log_columns),
+        "next_after_seq": rows[-1][0] if rows else after_seq
+    }
+
+def api_report(query, columns):
+    return lambda conn, params: {"rows": api_rows(conn.execute(query).fetchall(), columns)}
+
+api_routes = {
+    "/flights": api_flights,
+    "/flights/search": api_flight_search,
+    "/changes": api_changes,
+    "/destinations": lambda conn, params: {"destinations": api_rows(
+        [(destination_id, *details) for destination_id, details in dimension_cache(conn)["destinations"].items()], destination_columns)},
+    "/pilots": lambda conn, params: {"pilots": api_rows(
+        [(pilot_id, *details) for pilot_id, details in dimension_cache(conn)["pilots"].items()], pilot_columns)},
+    "/reports/popular-destinations": api_report(most_popular_destinations_query, ("country", "airport", "city", "total_flights")),
+    "/reports/unpopular-destinations": api_report(least_popular_destinations_query, ("country", "airport", "city", "total_flights")),
+    "/reports/pilot-workload": api_report(count_flights_by_pilot_query, ("pilot_id", "forename", "surname", "total_flights")),
+    "/reports/flights-by-status": api_report(count_flights_by_status_query, ("status", "total_flights")),
+    "/reports/most-experienced-pilots": api_report(most_experienced_pilots_query, ("forename", "surname", "years_of_xp")),
+    "/reports/least-experienced-pilots": api_report(least_experienced_pilots_query, ("forename", "surname", "years_of_xp"))
+}
+
+def api_route(path):
+    #Returns (function(conn, params), extra arguments) for a request path, or None for an unknown path
+    if path in api_routes:
+        return api_routes[path], ()
+    parts = path.strip("/").split("/")
+    if len(parts) == 3 and parts[0] == "pilots" and parts[2] == "schedule" and parts[1].isdigit():
+        return api_pilot_schedule, (int(parts[1]),)
+    return None
+
+def serve_api(host="127.0.0.1", port=8080, path=None, profile=None, pool_size=8, queue_timeout=5.0):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlsplit
+    import json
+
+    pool = ReadConnectionPool(path, profile, pool_size)
+    etag_token = f"{os.getpid():x}{int(perf_counter() * 1000):x}"
+
+    class FlightAPIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, status, payload, etag=None):
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            if status == 503:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            route = api_route(url.path.rstrip("/") or "/")
+            if route is None:
+                self.send_json(404, {"error": f"Unknown endpoint {url.path}", "endpoints": sorted(api_routes) + ["/pilots/<pilot_id>/schedule"]})
+                return
+            etag = f'"{etag_token}-{pool.data_version()}"'
+            if etag in [tag.strip().removeprefix("W/") for tag in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            conn = pool.acquire(queue_timeout)
+            if conn is None:
+                self.send_json(503, {"error": "All database connections are busy, try again shortly"})
+                return
+            try:
+                function, route_args = route
+                payload = function(conn, parse_qs(url.query), *route_args)
+            except ValueError as error:
+                self.send_json(400, {"error": str(error)})
+                return
+            except sqlite3.Error as error:
+                self.send_json(500, {"error": str(error)})
+                return
+            finally:
+                pool.release(conn)
+            if payload is None:
+                self.send_json(404, {"error": "Not found"})
+                return
+            self.send_json(200, payload, etag)
+
+        def log_message(self, format, *log_args):
+            #Per-request logging would dominate the cost of small cached responses
+            pass
+
+    server = ThreadingHTTPServer((host, port), FlightAPIHandler)
+    server.daemon_threads = True
+    print(f"Serving the flight API on http://{host}:{server.server_address[1]} with {pool_size} read connections (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping the flight API")
+    finally:
+        server.server_close()
+        pool.close()
+
+def load_test(base_url, paths, requests=1000, concurrency=8, use_etag=False, output=None):
+    #Sends requests round-robin over paths from concurrency keep-alive connections and reports latency percentiles,
+    #throughput and response status counts. With use_etag each connection revalidates with the ETag it last received.
+    from concurrent.futures import ThreadPoolExecutor
+    from http.client import HTTPConnection
+    from urllib.parse import urlsplit
+    import json
+
+    if requests < 1 or concurrency < 1:
+        raise ValueError("A load test needs at least 1 request and 1 connection")
+    target = urlsplit(base_url)
+    per_worker = [requests // concurrency + (1 if worker < requests % concurrency else 0) for worker in range(concurrency)]
+
+    def worker(worker_index):
+        client = HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        etags = {}
+        timings = []
+        statuses = {}
+        for request_index in range(per_worker[worker_index]):
+            path = paths[(worker_index + request_index) % len(paths)]
+            headers = {"If-None-Match": etags[path]} if use_etag and path in etags else {}
+            start = perf_counter()
+            client.request("GET", path, headers=headers)
+            response = client.getresponse()
+            response.read()
+            timings.append(perf_counter() - start)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            if response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+        client.close()
+        return timings, statuses
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    elapsed = perf_counter() - start
+
+    timings = sorted(timing for worker_timings, _ in results for timing in worker_timings)
+    statuses = {}
+    for _, worker_statuses in results:
+        for status, count in worker_statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+    report = {
+        "base_url": base_url,
+        "paths": paths,
+        "requests": len(timings),
+        "concurrency": concurrency,
+        "etag": use_etag,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(timings) / elapsed, 1) if elapsed > 0 else None,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(timings[-1] * 1000, 3),
+        "statuses": statuses
+    }
+    print(f"{report['requests']} requests, {concurrency} connections in {report['seconds']}s: "
+          f"{report['requests_per_sec']} req/sec, p50 {report['p50_ms']}ms, p95 {report['p95_ms']}ms, "
+          f"p99 {report['p99_ms']}ms, max {report['max_ms']}ms, statuses {statuses}")
+    if output:
+        with open(output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Load test results written to {output}")
+    return report
+
+def init_schema(conn, verify_plans=True):
+    #Brings the database up to the current schema and returns True if any migration was applied.
+    #Query plans can only change when the schema does, so they are re-verified whenever a migration has been applied.
+    schema_changed = apply_migrations(conn)
+    if schema_changed and verify_plans:
+        full_scans = check_query_plans(conn)
+        if full_scans:
+            failures = "; ".join(f"{function_name}: {detail}" for function_name, detail in full_scans)
+            raise ValueError(f"One or more queries fall back to a full table scan ({failures}). Check the index migrations.")
+        print("Query plans verified >>>\n", file=sys.stderr)
+    return schema_changed
+
+def main(argv=None):
+    import atexit
+    args = build_parser().parse_args(argv)
+    try:
+        configure_instrumentation(args.slow_query_ms, args.query_log, args.query_stats)
+        conn = connect(profile=args.profile)
+    except ValueError as error:
+        sys.exit(str(error))
+
+    if args.query_stats:
+        atexit.register(print_query_stats)
+
+    try:
+        init_schema(conn)
+    except ValueError as error:
+        sys.exit(f"Refusing to start: {error}")
+
+    if args.seed:
+        try:
+            seed_sample_data(conn)
+        except ValueError as error:
+            sys.exit(str(error))
+
+    if args.command == "import":
+        try:
+            import_flights(conn, args.path, args.batch_size, args.allow_conflicts)
+        except OSError as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command == "export":
+        try:
+            export_data(conn, args.path, args.source, args.export_format, args.compression, args.chunk_size)
+        except ValueError as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command == "analytics":
+        try:
+            if args.action == "count":
+                analytics_count(conn, args.keys, args.statuses, args.date_from, args.date_to, args.top)
+            elif args.action == "ratio":
+                analytics_ratio(conn, args.keys, args.status, args.date_from, args.date_to, args.top)
             else:
-                print("\nInvalid input. Please try again.\n")
+                analytics_histogram(conn, args.key, args.statuses, args.date_from, args.date_to)
+        except ValueError as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command == "advance-statuses":
+        if args.every is not None and args.now:
+            sys.exit("--now can only be used for a single tick, not with --every")
+        try:
+            offsets = status_advancement_offsets(args.boarding_minutes, args.departed_minutes, args.arrived_minutes)
+            run_status_advancement(conn, args.every, args.now, offsets, args.dry_run)
+        except ValueError as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command == "generate":
+        try:
+            generate_sample_data(conn, args.flights, args.random_seed, args.destinations, args.pilots, args.batch_size)
+        except ValueError as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command == "benchmark":
+        run_benchmarks(args.sizes, args.random_seed, args.repeat, args.time_limit, args.data_dir, args.output,
+                       args.profile, args.functions)
+        sys.exit()
+
+    if args.command == "batch":
+        try:
+            run_batch_file(conn, args.path, args.batch_size)
+        except (OSError, ValueError) as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command == "serve":
+        serve_api(args.host, args.port, profile=args.profile, pool_size=args.connections, queue_timeout=args.queue_timeout)
+        sys.exit()
+
+    if args.command == "load-test":
+        try:
+            load_test(args.url, args.paths, args.requests, args.concurrency, args.etag, args.output)
+        except ValueError as error:
+            sys.exit(str(error))
+        sys.exit()
+
+    if args.command in ("flights", "destinations", "pilots", "report", "changes"):
+        try:
+            args.run(conn, args)
+        except (sqlite3.Error, ValueError) as error:
+            sys.exit(f"{args.command} {args.action} failed: {error}")
+        sys.exit()
+
+    if args.command == "counts":
+        if args.action == "rebuild":
+            rebuild_flight_counts(conn)
+        mismatches = verify_flight_counts(conn)
+        for table, key, stored, actual in mismatches:
+            print(f"{table}[{key}]: stored {stored}, actual {actual}")
+        if mismatches:
+            sys.exit(f"{len(mismatches)} flight counters are out of date. Run 'counts rebuild' to fix them.")
+        print("Flight counters verified")
+        sys.exit()
+
+    #The banners are for the interactive menu only, so subcommand output stays clean for scripts and pipes
+    print("Database ready >>>")
+    print("Tables ready >>>")
+    print("Data ready >>> \n \n")
+    run_menu(conn)
+    conn.close()
+
+def run_menu(conn):
+    while True:
+        print(" \n --- Welcome to the Flight Information Tool --- \n")
+        print("Select an option from the menu below: \n")
+        print("1) View All Flight Information - Enter '1'")
+        print("2) View Flight Information by Specific Criteria - Enter '2'")
+        print("3) Add a New Flight - Enter '3'")
+        print("4) Update Flight Information (Including Pilot Assignment) - Enter '4'")
+        print("5) Update Destination Information - Enter '5'")
+        print("6) View Pilot Information & Schedule - Enter '6'")
+        print("7) View Most and Least Popular Destinations - Enter '7'")
+        print("8) View Query Statistics - Enter '8'")
+        print("9) Exit - Enter '9'")
+        print()
+        selection = input("Select an option: \n")
     
+        if selection == '1':
+            all_flight_details(conn)
 
-    #View Most and Least Popular Destinations functions (sub-menu)  
-    elif selection == '7':
-        while True:
-            print("\nPlease select an option by entering the corresponding number\n")
-            print("1) View Most Popular Destinations - Enter '1'")
-            print("2) View Least Popular Destinations - Enter '2'")
-            print("3) Return to Main Menu - Enter '3'")
+        elif selection == '2':
+            while True:
+                print("\nPlease select a criteria by entering the corresponding number\n")
+                print("1) Filter Flights by Destination Airport - Enter '1'")
+                print("2) Filter Flights by Destination City - Enter '2'")
+                print("3) Filter Flights by Status - Enter '3'")
+                print("4) Filter Flights by Date - Enter '4'")
+                print("5) Filter Flights by Several Criteria - Enter '5'")
+                print("6) Filter Flights by Departure Window - Enter '6'")
+                print("7) Search Flights by Pilot or Destination Keywords - Enter '7'")
+                print("8) Find a Connection Between Two Airports - Enter '8'")
+                print("9) Return to main menu - Enter '9'")
+                print()
+                criteria_selection = input("Select a criteria:\n")
+                if criteria_selection == '1':
+                    airport = input("\nEnter the airport name, or just the start of it:\n")
+                    flights_by_airport(conn, airport, prefix=True)
+                elif criteria_selection == '2':
+                    city = input("\nEnter the city name, or just the start of it:\n")
+                    flights_by_city(conn, city, prefix=True)
+                elif criteria_selection == '3':
+                    status = input("\nEnter the flight status ('Arrived', 'Cancelled', 'Departed', 'Boarding', 'Scheduled'):\n")
+                    flights_by_status(conn, status)
+                elif criteria_selection == '4':
+                    date = input("\nEnter the date (YYYY-MM-DD):\n")
+                    flights_filtered_by_date(conn, date)
+                elif criteria_selection == '5':
+                    print("\nLeave any criteria blank to skip it. Airports and cities can be just the start of the name.\n")
+                    filters = {
+                        "origin_airport":      input("Origin airport: "),
+                        "origin_city":         input("Origin city: "),
+                        "destination_airport": input("Destination airport: "),
+                        "destination_city":    input("Destination city: "),
+                        "statuses":            [status.strip() for status in input("Statuses (comma separated): ").split(",") if status.strip()],
+                        "date_from":           input("From date (YYYY-MM-DD): "),
+                        "date_to":             input("To date (YYYY-MM-DD): "),
+                        "time_from":           input("Departing from (HH:MM): "),
+                        "time_to":             input("Departing until (HH:MM): "),
+                        "pilot_id":            input("Pilot ID: ")
+                    }
+                    if filters["pilot_id"]:
+                        filters["pilot_id"] = int(filters["pilot_id"])
+                    search_flights(conn, prefix_match=True, **{name: value for name, value in filters.items() if value})
+                elif criteria_selection == '6':
+                    start = input("\nEnter the earliest departure (YYYY-MM-DD HH:MM), or leave blank for no lower limit:\n")
+                    end = input("\nEnter the latest departure (YYYY-MM-DD HH:MM), or leave blank for no upper limit:\n")
+                    flights_departing_between(conn, start or None, end or None, include_end=True)
+                elif criteria_selection == '7':
+                    keywords = input("\nEnter pilot names, license numbers, emails, airports, cities or countries (e.g. 'sarah frankfurt'):\n")
+                    flights_by_keywords(conn, keywords)
+                elif criteria_selection == '8':
+                    origin = input("\nEnter the origin airport or city:\n")
+                    destination = input("\nEnter the destination airport or city:\n")
+                    date = input("\nEnter the travel date (YYYY-MM-DD):\n")
+                    after = input("\nEnter the earliest departure time (HH:MM), or leave blank for any time that day:\n")
+                    try:
+                        find_connection(conn, origin, destination, date, after or "00:00")
+                    except ValueError as error:
+                        print(f"\n{error}\n")
+                elif criteria_selection == '9':
+                    print("\nReturning to main menu\n")
+                    break
+                else:
+                    print("\nInvalid input. Please try again.\n")
+
+    
+        elif selection == '3':
+            print("\n Enter the following information to add a new flight record: \n")
+            date = input("Date (YYYY-MM-DD): ")
+            time = input("Time - 24hr Clock Format (HH:MM): ")
+            origin_id = int(input("Origin ID: "))
+            destination_id = int(input("Destination ID: "))
+            pilot_id = int(input("Pilot ID: "))
+            status = input("Status (Arrived, Cancelled, Boarding, Departed, Scheduled): ")
+            try:
+                insert_new_flight_record(conn, date, time, origin_id, destination_id, pilot_id, status)
+            except ValueError as error:
+                print(f"\n{error}\nThe flight was not added.")
             print()
-            option_selection = input("Select one of the following:\n")
-            if option_selection == '1':
-                most_popular_destinations(conn)
-            elif option_selection == '2':
-                least_popular_destinations(conn)
-            elif option_selection == '3':
-                print("\nReturning to main menu\n")
-                break
-            else:
-                print("\nInvalid input. Please try again.\n")
+
+        #Update flight information functions (sub-menu)
+        elif selection == '4':
+            while True:
+                print("\nPlease select an option by entering the corresponding number\n")
+                print("1) Update Flight Date - Enter '1'")
+                print("2) Update Flight Time - Enter '2'")
+                print("3) Update Flight Status - Enter '3'")
+                print("4) Assign Pilot to Flight - Enter '4'")
+                print("5) Delete a Flight Record - Enter '5'")
+                print("6) Auto-assign Pilots to Scheduled Flights - Enter '6'")
+                print("7) Return to main menu - Enter '7'")
+                print()
+                option_selection = input("Select one of the following:\n")
+                try:
+                    if option_selection == '1':
+                        flight_id = int(input("\nEnter the flight ID:\n"))
+                        new_date = input("\nEnter the new date (YYYY-MM-DD):\n")
+                        update_flight_date(conn, flight_id, new_date)
+                    elif option_selection == '2':
+                        flight_id = int(input("\nEnter the flight ID:\n"))
+                        new_time = input("\nEnter the new time - 24hr Clock Format (HH:MM):\n")
+                        update_flight_time(conn, flight_id, new_time)
+                    elif option_selection == '3':
+                        flight_id = int(input("\nEnter the flight ID:\n"))
+                        new_status = input("\nEnter the new status ('Arrived', 'Cancelled', 'Boarding', 'Departed', 'Scheduled'):\n")
+                        update_flight_status(conn, flight_id, new_status)
+                    elif option_selection == '4':
+                        flight_id = int(input("\nEnter the flight ID:\n"))
+                        pilot_id = int(input("\nEnter the pilot ID:\n"))
+                        assign_pilot_to_flight(conn, flight_id, pilot_id)
+                    elif option_selection == '6':
+                        date_from = input("\nEnter the first date (YYYY-MM-DD):\n")
+                        date_to = input("\nEnter the last date (YYYY-MM-DD):\n")
+                        auto_assign_pilots(conn, date_from, date_to, dry_run=True)
+                        if input("\nApply this plan? (y/n):\n").strip().lower() == "y":
+                            auto_assign_pilots(conn, date_from, date_to)
+                except ValueError as error:
+                    print(f"\n{error}\nThe flight was not changed.")
+                if option_selection == '5':
+                    flight_id = int(input("\nEnter the flight ID:\n"))
+                    delete_flight_record(conn, flight_id)
+                elif option_selection == '7':
+                    print("\nReturning to main menu\n")
+                    break
+
+        #Update Destinations functions (sub-menu)
+        elif selection == '5':
+            while True:
+                print("\nPlease select an option by entering the corresponding number\n")
+                print("1) View All Destinations - Enter '1'")
+                print("2) Add New Destination - Enter '2'")
+                print("3) Delete A Destination - Enter '3'")
+                print("4) Update a Flight Destination - Enter '4'")
+                print("5) Return to Main Menu - Enter '5'")
+                print()
+                option_selection = input("Select one of the following:\n")
+                if option_selection == '1':
+                    view_all_destinations(conn)
+                elif option_selection == '2':
+                    airport = input("\nEnter the airport name (case sensitive):\n")
+                    city = input("\nEnter the city name (case sensitive):\n")
+                    country = input("\nEnter the country name (case sensitive):\n")
+                    add_destination(conn, airport, city, country)
+                elif option_selection == '3':
+                    airport = input("\nEnter the airport name (case sensitive):\n")
+                    delete_destination(conn, airport)
+                elif option_selection == '4':
+                    flight_id = int(input("\nEnter the flight ID:\n"))
+                    destination_id = int(input("\nEnter the new destination_id:\n"))
+                    update_flight_destination(conn, flight_id, destination_id)
+                elif option_selection == '5':
+                    print("\nReturning to main menu\n")
+                    break
+                else:
+                    print("\nInvalid input. Please try again.\n")
+                
+
+        #View Pilot Schedule & Information (sub-menu)
+        elif selection == '6':
+            while True:
+                print("\nPlease select an option by entering the corresponding number\n")
+                print("1) View All Pilot Information - Enter '1'")
+                print("2) View Schedule for a Specific Pilot - Enter '2'")
+                print("3) View Number of Flights Assigned to Each Pilot - Enter '3'")
+                print("4) View Most Experienced Pilots - Enter '4'")
+                print("5) View Least Experienced Pilots - Enter '5'")
+                print("6) View Double-Booked Pilots - Enter '6'")
+                print("7) Return to Main Menu - Enter '7'")
+                print()
+                option_selection = input("Select one of the following:\n")
+                if option_selection == '1':
+                    view_all_pilots(conn)
+                elif option_selection == '2':
+                    pilot_id = int(input("\nEnter the pilot ID:\n"))
+                    filter_by_pilot(conn, pilot_id)
+                elif option_selection == '3':
+                    count_flights_by_pilot(conn)
+                elif option_selection == '4':
+                    most_experienced_pilots(conn)
+                elif option_selection == '5':
+                    least_experienced_pilots(conn)
+                elif option_selection == '6':
+                    find_pilot_conflicts(conn)
+                elif option_selection == '7':
+                    print("\nReturning to main menu\n")
+                    break
+                else:
+                    print("\nInvalid input. Please try again.\n")
+    
+
+        #View Most and Least Popular Destinations functions (sub-menu)  
+        elif selection == '7':
+            while True:
+                print("\nPlease select an option by entering the corresponding number\n")
+                print("1) View Most Popular Destinations - Enter '1'")
+                print("2) View Least Popular Destinations - Enter '2'")
+                print("3) View Number of Flights by Status - Enter '3'")
+                print("4) Ad-hoc Flight Analytics - Enter '4'")
+                print("5) Return to Main Menu - Enter '5'")
+                print()
+                option_selection = input("Select one of the following:\n")
+                if option_selection == '1':
+                    most_popular_destinations(conn)
+                elif option_selection == '2':
+                    least_popular_destinations(conn)
+                elif option_selection == '3':
+                    count_flights_by_status(conn)
+                elif option_selection == '4':
+                    print(f"\nGroup by one or more of: {', '.join(analytics_keys)}")
+                    keys = input("Keys (space separated), or 'histogram hour|weekday|day|month':\n").split()
+                    statuses = [status.strip() for status in input("Only these statuses (comma separated, blank for all): ").split(",") if status.strip()]
+                    try:
+                        if keys[:1] == ["histogram"]:
+                            analytics_histogram(conn, keys[1] if len(keys) > 1 else "hour", statuses)
+                        else:
+                            analytics_count(conn, keys, statuses, top=20)
+                    except ValueError as error:
+                        print(f"\n{error}\n")
+                elif option_selection == '5':
+                    print("\nReturning to main menu\n")
+                    break
+                else:
+                    print("\nInvalid input. Please try again.\n")
             
-    elif selection == '8':
-        print("\nExiting the program...")
-        print("Exited. Thank you for using the Flight Information Tool!")
-        break
-        
-    else:
-        print("Invalid selection. Please try again.\n")
-        
+        elif selection == '8':
+            print_query_stats()
+
+        elif selection == '9':
+            print("\nExiting the program...")
+            print("Exited. Thank you for using the Flight Information Tool!")
+            break
         
-    
+        else:
+            print("Invalid selection. Please try again.\n")
+
+
 #-----------------------------------------------------------------------#
 
 #SQL Query Planning Documented in the Section Below Prior to Writing Python Functions
@@ -1198,3 +4729,6 @@ for row in rows:
     print(row)
 '''
 
+
+if __name__ == "__main__":
+    main()